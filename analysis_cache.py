@@ -0,0 +1,46 @@
+import hashlib
+import json
+import os
+import time
+
+from cache_utils import atomic_write, cache_path
+
+# Thời gian sống của phân tích AI (giây); 0 = không hết hạn
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "0"))
+
+
+def analysis_key(image_bytes, model, *prompts):
+    """Content address of an analysis: image bytes, model id and prompt texts"""
+    digest = hashlib.sha256()
+    for part in (image_bytes, model.encode("utf-8"), *(p.encode("utf-8") for p in prompts)):
+        # Ghi độ dài trước mỗi phần để các cách ghép khác nhau không trùng khóa
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def analysis_file(key):
+    return cache_path("analyses", key[:2], f"{key}.json")
+
+
+def load_analysis(key, ttl=None):
+    """Cached analysis text for key, or None when missing or older than ttl"""
+    ttl = ANALYSIS_CACHE_TTL if ttl is None else ttl
+    try:
+        with open(analysis_file(key), encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if ttl and time.time() - entry["created"] > ttl:
+        return None
+    return entry["analysis"]
+
+
+def save_analysis(key, analysis, **meta):
+    """Store an analysis; a failed write is reported but never fails the caller"""
+    entry = {"analysis": analysis, "created": time.time(), **meta}
+    try:
+        with atomic_write(analysis_file(key), "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+    except OSError as e:
+        print(f"Không lưu được cache phân tích {key[:12]}: {e}")
@@ -0,0 +1,147 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+# Chạy hàng loạt chỉ in bảng tổng kết, không in dung lượng từng file PDF
+os.environ.setdefault("PDF_SIZE_REPORT", "0")
+
+from chart_service import ChartService
+from financial_ratio import calc_ratio_panel
+from generate_pdf import DATE_TARGET, ReportJob, generate_report, setup_fonts
+from marketcap import MARKETCAP_FILE, read_icb_table
+from marketcap_store import get_marketcap_store, publish_marketcap_store, use_published_stores
+from price_store import prefetch_history
+from shared_data import publish_frame, shared_folder, shared_folder_path, use_shared_folder
+from statement_loader import pool_context
+
+# Số báo cáo chạy song song (mỗi báo cáo một tiến trình) và số luồng tải giá lúc chuẩn bị
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+PRICE_FETCH_THREADS = int(os.getenv("PRICE_FETCH_THREADS", "8"))
+
+
+def sector_tickers(icb_level_1, icb_level_2=None):
+    """Tickers of an ICB sector, filtered like marketcap.get_sector_companies"""
+    df = read_icb_table()
+    rows = df[df["Ngành ICB - cấp 1"] == icb_level_1]
+    if icb_level_2:
+        rows = rows[rows["Ngành ICB - cấp 2"] == icb_level_2]
+    return sorted(rows["Mã"].dropna().astype(str).unique())
+
+
+def preload(tickers, date_target=DATE_TARGET, folder=None):
+    """Load statements, market caps and price histories once, before the workers start.
+
+    With a shared folder the ratio panel and the market-cap matrix are
+    published there, and every worker maps the same pages read-only instead
+    of holding its own copy. Returns the published store names for init_worker.
+    """
+    calc_ratio_panel()
+    get_marketcap_store(MARKETCAP_FILE, sheet_name="Sheet2")
+    read_icb_table()
+    store_names = {}
+    if folder:
+        publish_frame("ratio_panel", calc_ratio_panel(), folder=folder)
+        store_names = publish_marketcap_store(MARKETCAP_FILE, "Sheet2", folder)
+
+    def fetch(symbol):
+        try:
+            prefetch_history(symbol, [("2020-01-01", date_target)])
+        except Exception as e:
+            print(f"Không tải được giá của {symbol}: {e}")
+
+    with ThreadPoolExecutor(max_workers=PRICE_FETCH_THREADS) as pool:
+        list(pool.map(fetch, [*tickers, "VNINDEX"]))
+    return store_names
+
+
+def init_worker(folder, store_names):
+    """Pool initializer: attach to the shared folder and the market-cap stores published by preload"""
+    use_shared_folder(folder)
+    use_published_stores(store_names)
+
+
+def run_report(symbol, date_target, output_dir):
+    """Build one ticker's report; returns (symbol, pdf path or None, error or None, seconds)"""
+    started = time.perf_counter()
+    try:
+        setup_fonts()
+        job = ReportJob(symbol, date_target, output_path=os.path.join(output_dir, f"{symbol}_{date_target}.pdf"),
+                        chart_dir=os.path.join(output_dir, "charts", symbol))
+        # Mỗi báo cáo đã có tiến trình riêng nên vẽ biểu đồ ngay trong tiến trình đó
+        path = generate_report(job, ChartService(workers=1))
+        return symbol, path, None, time.perf_counter() - started
+    except Exception as e:
+        return symbol, None, f"{type(e).__name__}: {e}", time.perf_counter() - started
+
+
+def run_batch(tickers, output_dir="reports", workers=None, date_target=DATE_TARGET, store_names=None):
+    """Generate the reports of all tickers and return their results in input order"""
+    os.makedirs(output_dir, exist_ok=True)
+    workers = max(1, min(BATCH_WORKERS if workers is None else workers, len(tickers)))
+    results = {}
+    if workers == 1:
+        for symbol in tickers:
+            results[symbol] = run_report(symbol, date_target, output_dir)
+            print(f"{symbol}: {'xong' if results[symbol][1] else 'lỗi'} ({results[symbol][3]:.1f} s)")
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(),
+                                 initializer=init_worker, initargs=(shared_folder_path(), store_names)) as pool:
+            futures = [pool.submit(run_report, symbol, date_target, output_dir) for symbol in tickers]
+            for future in as_completed(futures):
+                symbol, path, error, seconds = future.result()
+                results[symbol] = (symbol, path, error, seconds)
+                print(f"{symbol}: {'xong' if path else 'lỗi'} ({seconds:.1f} s)")
+    return [results[symbol] for symbol in tickers]
+
+
+def print_summary(results, elapsed, preload_seconds):
+    print(f"\n{'Mã':6s} {'Kết quả':8s} {'Thời gian':>10s} {'Dung lượng':>11s}  Chi tiết")
+    for symbol, path, error, seconds in results:
+        if path:
+            size = f"{os.path.getsize(path) / 1024:,.0f} KB"
+            print(f"{symbol:6s} {'OK':8s} {seconds:8.1f} s {size:>11s}  {path}")
+        else:
+            print(f"{symbol:6s} {'LỖI':8s} {seconds:8.1f} s {'':>11s}  {error}")
+    failed = sum(1 for _, path, _, _ in results if not path)
+    print(f"Tổng: {len(results)} mã, {len(results) - failed} thành công, {failed} lỗi trong {elapsed:.1f} s "
+          f"(chuẩn bị dữ liệu {preload_seconds:.1f} s)")
+    return failed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Tạo báo cáo PDF cho nhiều mã cổ phiếu")
+    parser.add_argument("tickers", nargs="*", help="danh sách mã, ví dụ: MWG FRT DGW")
+    parser.add_argument("--icb1", help="lọc theo ngành ICB cấp 1, ví dụ: 'Dịch vụ Tiêu dùng'")
+    parser.add_argument("--icb2", help="lọc thêm theo ngành ICB cấp 2, ví dụ: 'Bán lẻ'")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="số báo cáo chạy song song")
+    parser.add_argument("--output-dir", default="reports", help="thư mục lưu PDF và biểu đồ")
+    args = parser.parse_args(argv)
+    if not args.tickers and not args.icb1:
+        parser.error("cần danh sách mã hoặc --icb1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    started = time.perf_counter()
+    # Bỏ mã trùng (giữ thứ tự) để hai báo cáo không cùng ghi một file PDF và thư mục biểu đồ
+    tickers = list(dict.fromkeys(ticker.upper() for ticker in args.tickers))
+    if args.icb1:
+        tickers += [ticker for ticker in sector_tickers(args.icb1, args.icb2) if ticker not in tickers]
+    if not tickers:
+        print("Không có mã nào thuộc ngành đã chọn")
+        return 1
+
+    print(f"Chuẩn bị dữ liệu cho {len(tickers)} mã...")
+    with shared_folder() as folder:
+        store_names = preload(tickers, folder=folder)
+        preload_seconds = time.perf_counter() - started
+        results = run_batch(tickers, args.output_dir, args.workers, store_names=store_names)
+    failed = print_summary(results, time.perf_counter() - started, preload_seconds)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+# So sánh cách trích xuất cũ (parse cả trang bằng html.parser) với html_extract
+# Chạy từ thư mục gốc: python benchmarks/bench_html_parse.py
+# Trang trong fixtures/ là trang TỔNG HỢP (không phải trang Vietstock/MWG lưu lại): chỉ giữ cấu trúc
+# div.intro_content và div#profile-1, phần còn lại là script và bảng độn để có kích thước cỡ trang thật
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from html_extract import HTML_PARSER, extract_intro, extract_profile
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+REPEAT = 20
+
+
+def legacy_intro(content):
+    soup = BeautifulSoup(content, 'html.parser')
+    intro = soup.find('div', class_='intro_content').find('p')
+    return intro.get_text(strip=True) if intro else None
+
+
+def legacy_profile(content):
+    soup = BeautifulSoup(content, 'html.parser')
+    profile_div = soup.find("div", id="profile-1").find("p")
+    for tag in profile_div.find_all(['b', 'a', 'span']):
+        tag.unwrap()
+    fields = str(profile_div).replace("</p>", "").split("<p>")[1:]
+    info = {}
+    for text in fields:
+        for key in ["Địa chỉ", "Điện thoại", "Website"]:
+            if key in text:
+                value = text.split(":")[-1].strip()
+                info[key] = f"http:{value}" if key == "Website" else value
+    return info
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+if __name__ == "__main__":
+    cases = [
+        ("intro", read_fixture("mwg_home.html"), legacy_intro, extract_intro),
+        ("profile", read_fixture("vietstock_profile.html"), legacy_profile, extract_profile),
+    ]
+    parsers = ["html.parser"] + (["lxml"] if HTML_PARSER == "lxml" else [])
+    print(f"Lặp {REPEAT} lần, mặc định dùng {HTML_PARSER}")
+    for name, content, legacy, targeted in cases:
+        legacy_ms = timeit.timeit(lambda: legacy(content), number=REPEAT) / REPEAT * 1000
+        print(f"{name:8s} {len(content) / 1024:4.0f} KB  cũ (cả trang):      {legacy_ms:7.1f} ms")
+        for parser in parsers:
+            assert legacy(content) == targeted(content, parser), f"Kết quả {name} ({parser}) khác cách cũ"
+            ms = timeit.timeit(lambda: targeted(content, parser), number=REPEAT) / REPEAT * 1000
+            print(f"{'':16s}{parser:12s}         {ms:7.1f} ms (nhanh hơn {legacy_ms / ms:.1f} lần)")
@@ -0,0 +1,37 @@
+# Đo thời gian import các module của dự án bằng `python -X importtime`
+# Chạy từ thư mục gốc: python benchmarks/bench_import.py
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["financial_ratio", "marketcap"]
+# Thư viện bên thứ ba được import sẵn để tách riêng chi phí của module dự án
+PRELOAD = "import numpy, pandas"
+BUDGET_MS = 50
+
+
+def import_times(module):
+    """Return {imported name: (self_us, cumulative_us)} for one fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"{PRELOAD}; import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+if __name__ == "__main__":
+    failed = False
+    for module in MODULES:
+        self_us, cumulative_us = import_times(module)[module]
+        status = "OK" if cumulative_us / 1000 <= BUDGET_MS else "CHẬM"
+        failed |= status != "OK"
+        print(f"{module}: self {self_us / 1000:.1f} ms, cumulative {cumulative_us / 1000:.1f} ms "
+              f"(không tính numpy/pandas) [{status}]")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,67 @@
+# So sánh dung lượng PDF: ảnh 300 dpi nhúng nguyên (ImageReader, ASCII85) với ảnh lấy mẫu lại theo kích thước đặt
+# Chạy từ thư mục gốc: python benchmarks/bench_pdf_size.py  (cần Roboto-Regular.ttf trong thư mục hiện tại)
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from chart_service import marketcap_chart, price_chart
+from pdf_output import binary_streams, draw_placed_image, pdf_size_report, report_canvas
+
+# Vị trí và kích thước đặt ảnh giống báo cáo: 2 biểu đồ giá nửa trang + 6 biểu đồ khác
+PLACEMENTS = [(10 * mm, 90 * mm, 60 * mm), (105 * mm, 90 * mm, 60 * mm)] + [(10 * mm, 190 * mm, 100 * mm)] * 6
+TEXT = "Công ty Cổ phần Đầu tư Thế Giới Di Động - báo cáo phân tích cổ phiếu MWG. " * 3
+
+
+def sample_charts(folder):
+    times = pd.bdate_range("2020-01-01", "2024-12-31")
+    df = pd.DataFrame({"time": times, "close": 50 + np.cumsum(np.random.default_rng(0).normal(0, 0.5, len(times)))})
+    caps = pd.DataFrame({"Ticker": ["MWG", "FRT", "DGW", "PET", "PNJ", "MSN"],
+                         "marketcap_3112": [90e6, 25e6, 10e6, 3e6, 30e6, 110e6]})
+    paths = [price_chart(df, "MWG", "6m", os.path.join(folder, "6m.png")),
+             price_chart(df, "MWG", "5y", os.path.join(folder, "5y.png"))]
+    for i in range(6):
+        paths.append(marketcap_chart(caps, save_path=os.path.join(folder, f"chart{i}.png"), dpi=300))
+    return paths
+
+
+def build(c, images, draw):
+    for i, (path, (x, width, height)) in enumerate(zip(images, PLACEMENTS)):
+        if i in (2, 5):
+            c.showPage()
+        c.setFont("Roboto", 11)
+        c.drawString(10 * mm, 280 * mm, TEXT[:95])
+        draw(c, path, x, 160 * mm - (i % 3) * 5 * mm, width, height)
+    c.save()
+
+
+def original(c, path, x, y, width, height):
+    c.drawImage(ImageReader(path), x, y, width=width, height=height)
+
+
+if __name__ == "__main__":
+    pdfmetrics.registerFont(TTFont("Roboto", "Roboto-Regular.ttf"))
+    with tempfile.TemporaryDirectory() as folder:
+        images = sample_charts(folder)
+        for name, make_canvas, draw, streams in [
+            ("gốc", lambda path: canvas.Canvas(path, pagesize=A4), original, contextlib.nullcontext),
+            ("tối ưu", report_canvas, draw_placed_image, binary_streams),
+        ]:
+            path = os.path.join(folder, f"{name}.pdf")
+            started = time.perf_counter()
+            with streams():
+                build(make_canvas(path), images, draw)
+            print(f"== {name}: {time.perf_counter() - started:.2f} s")
+            pdf_size_report(path)
@@ -0,0 +1,25 @@
+# So sánh đọc toàn bộ sheet với đọc theo cột cần cho labels
+# Chạy từ thư mục gốc: python benchmarks/bench_projection.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from statement_loader import compare_projected_read, needed_columns
+from financial_ratio import file_paths, labels
+
+START_COLUMN = "Trạng thái kiểm toán"
+
+if __name__ == "__main__":
+    columns = needed_columns(labels)
+    reports = [compare_projected_read(path, 2020 + i, columns, START_COLUMN)
+               for i, path in enumerate(file_paths)]
+
+    full_seconds = sum(r["full_seconds"] for r in reports)
+    projected_seconds = sum(r["projected_seconds"] for r in reports)
+    full_bytes = sum(r["full_bytes"] for r in reports)
+    projected_bytes = sum(r["projected_bytes"] for r in reports)
+    print(f"Tổng: {full_seconds:.2f}s -> {projected_seconds:.2f}s "
+          f"(tiết kiệm {full_seconds - projected_seconds:.2f}s), "
+          f"{full_bytes / 1e6:.1f} MB -> {projected_bytes / 1e6:.1f} MB "
+          f"(tiết kiệm {(full_bytes - projected_bytes) / 1e6:.1f} MB)")
@@ -0,0 +1,76 @@
+# Bộ nhớ của N tiến trình cùng giữ một bảng số liệu: mỗi tiến trình một bản (pickle) hay gắn vào bản dùng chung (memmap)
+# Chạy từ thư mục gốc: python benchmarks/bench_shared_data.py   (Linux, đọc /proc)
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from shared_data import attach_frame, publish_frame
+
+# Kích thước bảng mẫu (MB); bảng tỷ số thật chỉ vài MB nên phóng to để thấy rõ chênh lệch
+DATA_MB = int(os.getenv("BENCH_DATA_MB", "200"))
+COLUMNS = 19
+WORKER_COUNTS = (1, 2, 4)
+
+
+def sample_panel():
+    rows = DATA_MB * 2 ** 20 // (8 * COLUMNS)
+    index = pd.MultiIndex.from_arrays([np.arange(rows) // 5, np.arange(rows) % 5 + 2020], names=["Mã", "Năm"])
+    values = np.random.default_rng(0).normal(size=(rows, COLUMNS))
+    return pd.DataFrame(values, index=index, columns=[f"ratio_{i}" for i in range(COLUMNS)])
+
+
+def memory_kb():
+    """(peak RSS, PSS, private) of this process in KB"""
+    with open("/proc/self/status") as f:
+        status = dict(line.split(":", 1) for line in f)
+    with open("/proc/self/smaps_rollup") as f:
+        rollup = {line.split(":")[0]: line.split()[1] for line in f if ":" in line and line.split()[1].isdigit()}
+    private = int(rollup["Private_Clean"]) + int(rollup["Private_Dirty"])
+    return int(status["VmHWM"].split()[0]), int(rollup["Pss"]), private
+
+
+def worker(mode, folder, barrier, results):
+    if mode == "private":
+        with open(os.path.join(folder, "panel.pkl"), "rb") as f:
+            panel = pickle.load(f)
+    else:
+        panel, _ = attach_frame("panel", folder)
+    checksum = float(panel.to_numpy().sum())  # đọc toàn bộ dữ liệu như khi tính báo cáo
+    barrier.wait()  # đo khi mọi tiến trình cùng đang giữ dữ liệu
+    results.put((*memory_kb(), checksum))
+    barrier.wait()
+
+
+def measure(mode, folder, n):
+    ctx = multiprocessing.get_context("spawn")
+    barrier, results = ctx.Barrier(n), ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(mode, folder, barrier, results)) for _ in range(n)]
+    for p in processes:
+        p.start()
+    rows = [results.get() for _ in range(n)]
+    for p in processes:
+        p.join()
+    return [sum(row[i] for row in rows) / 1024 for i in range(3)]
+
+
+if __name__ == "__main__":
+    panel = sample_panel()
+    with tempfile.TemporaryDirectory() as folder:
+        with open(os.path.join(folder, "panel.pkl"), "wb") as f:
+            pickle.dump(panel, f, protocol=pickle.HIGHEST_PROTOCOL)
+        publish_frame("panel", panel, folder=folder)
+        del panel
+
+        print(f"Bảng {DATA_MB} MB, tổng của mọi tiến trình (MB)")
+        print(f"{'cách nạp':10s} {'tiến trình':>10s} {'RSS đỉnh':>10s} {'PSS':>10s} {'riêng':>10s}")
+        for mode in ("private", "shared"):
+            for n in WORKER_COUNTS:
+                peak_rss, pss, private = measure(mode, folder, n)
+                print(f"{mode:10s} {n:10d} {peak_rss:10.0f} {pss:10.0f} {private:10.0f}")
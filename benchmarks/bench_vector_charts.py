@@ -0,0 +1,64 @@
+# So sánh biểu đồ giá PNG 300 dpi (matplotlib -> file -> ImageReader) với vẽ vector bằng ReportLab
+# Chạy từ thư mục gốc: python benchmarks/bench_vector_charts.py
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from reportlab.graphics import renderPDF
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from chart_service import price_chart
+from vector_charts import price_chart_drawing
+
+REPEAT = 5
+PERIODS = [("6m", 10 * mm), ("5y", 105 * mm)]
+CHART_SIZE = (90 * mm, 60 * mm)
+
+
+def sample_prices():
+    times = pd.bdate_range("2020-01-01", "2024-12-31")
+    close = 50 + np.cumsum(np.random.default_rng(0).normal(0, 0.5, len(times)))
+    return pd.DataFrame({"time": times, "close": close})
+
+
+def png_report(df, folder):
+    pdf = io.BytesIO()
+    c = canvas.Canvas(pdf)
+    written = 0
+    for period, x in PERIODS:
+        path = os.path.join(folder, f"{period}.png")
+        price_chart(df, "MWG", period, save_path=path)
+        written += os.path.getsize(path)
+        c.drawImage(ImageReader(path), x, 150 * mm, width=CHART_SIZE[0], height=CHART_SIZE[1])
+    c.save()
+    return written, len(pdf.getvalue())
+
+
+def vector_report(df, _folder):
+    pdf = io.BytesIO()
+    c = canvas.Canvas(pdf)
+    for period, x in PERIODS:
+        renderPDF.draw(price_chart_drawing(df, "MWG", period, *CHART_SIZE), c, x, 150 * mm)
+    c.save()
+    return 0, len(pdf.getvalue())
+
+
+if __name__ == "__main__":
+    df = sample_prices()
+    print(f"2 biểu đồ, lặp {REPEAT} lần")
+    with tempfile.TemporaryDirectory() as folder:
+        for name, report in [("PNG 300 dpi", png_report), ("vector", vector_report)]:
+            started = time.perf_counter()
+            for _ in range(REPEAT):
+                written, pdf_size = report(df, folder)
+            seconds = (time.perf_counter() - started) / REPEAT
+            print(f"{name:12s}: {seconds * 1000:7.1f} ms/lần, ghi đĩa {written / 1024:6.0f} KB, "
+                  f"PDF {pdf_size / 1024:6.0f} KB")
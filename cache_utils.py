@@ -0,0 +1,50 @@
+import contextlib
+import hashlib
+import os
+import tempfile
+
+# Thư mục chứa các file cache (có thể đổi qua biến môi trường)
+CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "cache")
+
+
+def cache_path(*parts):
+    """Build a path inside CACHE_DIR, creating the parent folder if needed"""
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="wb", encoding=None):
+    """Write path through a unique temporary file next to it, replacing path only when the block succeeds.
+
+    Several processes may write the same cache entry at once; each gets its
+    own temporary file, and the last os.replace wins.
+    """
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.",
+                                    suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+        os.replace(tmp_file, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_file)
+        raise
+
+
+def file_sha256(file_path, chunk_size=1 << 20):
+    """Hash the content of a file"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(file_path):
+    """Cache key for a source file: path, mtime and content hash"""
+    abs_path = os.path.abspath(file_path)
+    mtime = os.stat(abs_path).st_mtime_ns
+    key = f"{abs_path}|{mtime}|{file_sha256(abs_path)}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
@@ -0,0 +1,230 @@
+import io
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+from matplotlib.dates import DateFormatter
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
+
+from render_cache import count, deliver, load_chart, render_key, store_chart
+from statement_loader import pool_context
+
+# Số tiến trình vẽ biểu đồ; 1 = vẽ ngay trong tiến trình chính
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+
+# Kiểu chữ riêng của biểu đồ vốn hóa, đặt thẳng lên Axes thay vì đổi rcParams toàn cục
+MARKETCAP_FONT = {"family": "serif", "size": 10}
+MARKETCAP_TITLE_FONT = {"family": "serif", "size": 15, "weight": "bold"}
+
+# Matplotlib không đảm bảo an toàn luồng: khi vẽ trong tiến trình chính thì vẽ lần lượt từng biểu đồ
+_render_lock = threading.Lock()
+
+
+def save_figure(fig, save_path=None, dpi=300):
+    """Write fig to save_path and return the path, or return the PNG bytes when no path is given"""
+    if save_path:
+        fig.savefig(save_path, dpi=dpi, bbox_inches="tight")
+        return save_path
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+def price_chart(df, symbol, period="6m", save_path=None, dpi=300, figsize=(5, 3)):
+    """Closing-price chart for the 6-month or 5-year window (Agg figure, no pyplot state)"""
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot()
+
+    if period == "6m":
+        df_filtered = df[(df["time"] >= "2024-07-01") & (df["time"] <= "2024-12-31")]
+        ax.plot(df_filtered["time"], df_filtered["close"], label="Giá đóng cửa", color="blue")
+        ticks = pd.date_range(start="2024-07-01", end="2024-12-31", freq="MS")
+        ax.set_xticks(ticks, labels=ticks.strftime('%m/%Y'))
+        ax.set_title(f"{symbol} - 6 tháng", loc="left", fontsize=10)
+    else:  # 5y
+        ax.plot(df["time"], df["close"], label="Giá đóng cửa", color="blue")
+        ax.xaxis.set_major_formatter(DateFormatter("%Y"))
+        ticks = pd.date_range(start="2020-01-01", end="2024-12-31", freq="YS")
+        ax.set_xticks(ticks, labels=ticks.strftime("%Y"))
+        ax.set_title(f"{symbol} - 5 năm", loc="left", fontsize=10)
+
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, _: f"{x:.3f}"))
+    ax.grid(True)
+    fig.tight_layout()
+    return save_figure(fig, save_path, dpi)
+
+
+def marketcap_chart(df_plot, highlight="MWG", title="Vốn hóa các cổ phiếu ngành Bán lẻ - 31/12/2024",
+                    save_path=None, dpi=100, figsize=(10, 6)):
+    """Bubble chart of market caps (columns Ticker, marketcap_3112) with one ticker highlighted"""
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot()
+
+    df_highlight = df_plot[df_plot["Ticker"] == highlight]
+    df_others = df_plot[df_plot["Ticker"] != highlight]
+    # Các cổ phiếu khác
+    ax.scatter(df_others["Ticker"], df_others["marketcap_3112"],
+               s=df_others["marketcap_3112"] / 1e3,  # scale size
+               c='skyblue', alpha=0.6, label='Khác')
+    # Mã cần làm nổi bật
+    ax.scatter(df_highlight["Ticker"], df_highlight["marketcap_3112"],
+               s=df_highlight["marketcap_3112"] / 1e3,
+               c='orange', alpha=0.9, label=highlight)
+
+    ax.set_title(title, fontdict=MARKETCAP_TITLE_FONT)
+    ax.set_ylabel("Vốn hóa (VNĐ)", fontdict=MARKETCAP_FONT, fontweight="bold")
+    ax.yaxis.set_tick_params(labelfontfamily=MARKETCAP_FONT["family"], labelsize=MARKETCAP_FONT["size"])
+    ax.yaxis.get_offset_text().set(**MARKETCAP_FONT)
+    ax.set_xticks([])  # Không hiển thị nhãn trên trục X
+    fig.tight_layout()
+    return save_figure(fig, save_path, dpi)
+
+
+def assets_chart(ratios, symbol, save_path=None, dpi=200, figsize=(10, 3.2)):
+    """Total assets and total liabilities per year (billion VND) as grouped bars"""
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot()
+
+    x = np.arange(len(ratios))
+    ax.bar(x - 0.2, ratios["Total Assets"], 0.4, label="Tổng tài sản", color="#E6B800")
+    ax.bar(x + 0.2, ratios["Total Liabilities"], 0.4, label="Tổng nợ phải trả", color="#4F81BD")
+    ax.set_xticks(x, labels=ratios["Năm"])
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda v, _: f"{v:,.0f}"))
+    ax.set_title(f"{symbol} - Tài sản và nợ phải trả (tỷ đồng)", loc="left", fontsize=10)
+    ax.legend(fontsize=8)
+    ax.grid(True, axis="y")
+    fig.tight_layout()
+    return save_figure(fig, save_path, dpi)
+
+
+def profitability_chart(ratios, symbol, save_path=None, dpi=200, figsize=(10, 3.2)):
+    """ROE, ROA and ROS (%) per year as lines"""
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot()
+
+    for column, color in (("ROE", "#E6B800"), ("ROA", "#4F81BD"), ("ROS", "#C0504D")):
+        ax.plot(ratios["Năm"], ratios[column], marker="o", label=column, color=color)
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda v, _: f"{v:.1f}%"))
+    ax.set_title(f"{symbol} - ROE, ROA, ROS", loc="left", fontsize=10)
+    ax.legend(fontsize=8)
+    ax.grid(True)
+    fig.tight_layout()
+    return save_figure(fig, save_path, dpi)
+
+
+def structure_chart(ratios, symbol, save_path=None, dpi=200, figsize=(10, 4.2)):
+    """Asset structure of the latest year as a pie chart"""
+    latest = ratios.iloc[-1]
+    current, fixed = max(latest["Total Current Assets"], 0), max(latest["Property/Plant/Equipment"], 0)
+    parts = {
+        "Tài sản ngắn hạn": current,
+        "Bất động sản, nhà xưởng, thiết bị": fixed,
+        "Tài sản dài hạn khác": max(latest["Total Assets"] - current - fixed, 0),
+    }
+    parts = {label: value for label, value in parts.items() if value > 0}
+
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot()
+    if parts:
+        ax.pie(list(parts.values()), autopct="%1.1f%%", startangle=90, pctdistance=0.75,
+               colors=["#E6B800", "#4F81BD", "#9BBB59"][:len(parts)], textprops={"fontsize": 9})
+        # Chú thích đặt bên cạnh để nhãn của phần nhỏ không đè lên nhau
+        ax.legend(list(parts), loc="center left", bbox_to_anchor=(1, 0.5), fontsize=9, frameon=False)
+    ax.set_aspect("equal")
+    ax.set_title(f"{symbol} - Cơ cấu tài sản năm {latest['Năm']}", loc="left", fontsize=10)
+    fig.tight_layout()
+    return save_figure(fig, save_path, dpi)
+
+
+def warm_up():
+    """Render a tiny date chart in a worker so its lazy imports and font cache load before real charts"""
+    fig = Figure(figsize=(1, 1))
+    fig.add_subplot().plot(pd.date_range("2024-01-01", periods=2), [0, 1])
+    save_figure(fig, dpi=10)
+    return os.getpid()
+
+
+def run_now(func, *args, **kwargs):
+    future = Future()
+    try:
+        with _render_lock:
+            future.set_result(func(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+class ChartService:
+    """Render independent figures concurrently in worker processes.
+
+    Renderers must be module-level functions of this module (or another
+    importable module) that build their own Figure and return a path or
+    PNG bytes. Falls back to rendering in the calling process when worker
+    processes are unavailable or workers <= 1; those renders are serialised
+    because matplotlib is not thread-safe.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = CHART_WORKERS if workers is None else workers
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start the workers now (in the background) so later charts do not pay for their startup"""
+        if self.workers > 1:
+            for _ in range(self.workers):
+                self.submit(warm_up)
+        return self
+
+    def submit(self, func, *args, **kwargs):
+        if self.workers > 1:
+            try:
+                with self.lock:
+                    if self.pool is None:
+                        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=pool_context())
+                    return self.pool.submit(func, *args, **kwargs)
+            except (OSError, BrokenProcessPool) as e:
+                print(f"Không chạy được tiến trình vẽ ({e}), vẽ trong tiến trình chính")
+                self.workers = 1
+        return run_now(func, *args, **kwargs)
+
+    def render(self, func, *args, save_path=None, **kwargs):
+        """Like submit(func, ...), but served from the render cache when the same data was drawn before"""
+        key = render_key(func, args, kwargs)
+        image = load_chart(key)
+        if image is not None:
+            count("hits")
+            future = Future()
+            future.set_result(deliver(image, save_path))
+            return future
+        count("misses")
+
+        result = Future()
+
+        def finish(future):
+            try:
+                image = future.result()
+                store_chart(key, image)
+                result.set_result(deliver(image, save_path))
+            except Exception as e:
+                result.set_exception(e)
+
+        # Tiến trình vẽ trả về bytes; ghi cache và file ở tiến trình chính
+        self.submit(func, *args, save_path=None, **kwargs).add_done_callback(finish)
+        return result
+
+    def shutdown(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=True)
+                self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
@@ -1,35 +1,18 @@
+import numbers
+from functools import lru_cache
+
 import pandas as pd
 import numpy as np
 
-def convert_units(df, factor, start_col):
-    start_idx = df.columns.get_loc(start_col) + 1
-    numeric_cols = df.columns[start_idx:]
-    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce') / factor
-    return df
-
-def clean_columns(df, year):
-    df.columns = df.columns.str.replace(f"Năm: {year}", "", regex=True)
-    df.columns = df.columns.str.replace(r"Đơn vị: (Tỷ|Triệu) VND", "", regex=True)
-    df.columns = df.columns.str.replace(r"\bHợp nhất\b|\bQuý: Hàng năm\b", "", regex=True)
-    df.columns = df.columns.str.strip()
-    df.drop(columns=[col for col in df.columns if "TM" in col], inplace=True)
-    return df
+from ratio_plan import compile_ratio_plan, evaluate_ratio_plan
+from shared_data import attach_frame
+from statement_loader import clean_columns, convert_units, load_all_data, needed_columns
 
 def standardize_columns(df):
     df = df.copy()
     df.columns = df.columns.str.strip().str.replace("\n", " ").str.upper()
     return df
 
-def load_all_data(file_paths, start_column, factor=1e9):
-    dfs = []
-    for i, file_path in enumerate(file_paths):
-        df = pd.read_excel(file_path, engine="openpyxl")
-        df = clean_columns(df, 2020 + i)
-        if i < 3:  # Chỉ chuyển đơn vị từ 2020 đến 2022
-            df = convert_units(df, factor, start_column)
-        dfs.append(df)
-    return dfs
-
 def merge_df(dfs, stock_code):
     years = range(2020, 2025)
     dfs = [standardize_columns(df) for df in dfs]
@@ -52,79 +35,73 @@ def transpose_data(df):
     df.rename(columns={"index": "Chỉ tiêu"}, inplace=True)
     return df.fillna(0)
 
-def calculate_financial_ratios(transposed_df, labels):
-    def get_values(transposed_df, label):
-        row = transposed_df[transposed_df["Chỉ tiêu"] == label]
-        return row.iloc[:, 1:].values.flatten() if not row.empty else np.zeros(len(transposed_df.columns[1:]))
-
-    def sum_labels(label_list):
-        return sum((get_values(transposed_df, label) for label in label_list), np.zeros(len(transposed_df.columns[1:])))
-
-    total_current_assets = sum_labels(labels["total_current_assets"])
-    ppe = sum_labels(labels["ppe"])
-    total_assets = sum_labels(labels["total_assets"])
-    total_current_liabilities = get_values(transposed_df, labels["total_current_liabilities"][0])
-    total_long_term_debt = get_values(transposed_df, labels["total_long_term_debt"][0])
-    total_liabilities = get_values(transposed_df, labels["total_liabilities"][0])
-
-    net_income = get_values(transposed_df, labels["net_income"][0])
-    interest_expense = get_values(transposed_df, labels["interest_expense"][0])
-    taxes = get_values(transposed_df, labels["taxes"][0])
-    depreciation_amortization = get_values(transposed_df, labels["depreciation_amortization"][0])
-    ebitda = net_income + interest_expense + taxes + depreciation_amortization
-
-    operating_profit = get_values(transposed_df, labels["operating_profit"][0])
-    other_profit = get_values(transposed_df, labels["other_profit"][0])
-    jv_profit = get_values(transposed_df, labels["jv_profit"][0])
-    net_income_before_taxes = operating_profit + other_profit + jv_profit
-
-    other_income = get_values(transposed_df, labels["other_income"][0])
-    net_income_before_extraordinary_items = net_income + other_income
-
-    revenue = get_values(transposed_df, labels["revenue"][0])
-    gross_profit = get_values(transposed_df, labels["gross_profit"][0])
-    financial_expense = get_values(transposed_df, labels["financial_expense"][0])
-    selling_expense = get_values(transposed_df, labels["selling_expense"][0])
-    admin_expense = get_values(transposed_df, labels["admin_expense"][0])
-    total_operating_expense = revenue - gross_profit + financial_expense + selling_expense + admin_expense
-
-    total_equity = get_values(transposed_df, labels["total_equity"][0])
-    total_debt = get_values(transposed_df, labels["total_debt"][0])
-
-    roe = np.divide(net_income, total_equity, out=np.zeros_like(net_income), where=total_equity != 0)
-    roa = np.divide(net_income, total_assets, out=np.zeros_like(net_income), where=total_assets != 0)
-    income_after_tax_margin = np.divide(net_income, revenue, out=np.zeros_like(net_income), where=revenue != 0)
-    revenue_to_total_assets = np.divide(revenue, total_assets, out=np.zeros_like(revenue), where=total_assets != 0)
-    long_term_debt_to_equity = np.divide(total_long_term_debt, total_equity, out=np.zeros_like(total_long_term_debt), where=total_equity != 0)
-    total_debt_to_equity = np.divide(total_debt, total_equity, out=np.zeros_like(total_debt), where=total_equity != 0)
-    ros = np.divide(net_income, revenue, out=np.zeros_like(net_income), where=revenue != 0)
+@lru_cache(maxsize=8)
+def get_ratio_plan(frozen_labels):
+    return compile_ratio_plan(ratio_definitions, dict(frozen_labels), intermediate_definitions)
 
-    years = transposed_df.columns[1:]
-    financial_ratios = pd.DataFrame({
-        "Năm": years,
-        "Total Current Assets": [f"{value:,.2f}" for value in total_current_assets],
-        "Property/Plant/Equipment": [f"{value:,.2f}" for value in ppe],
-        "Total Assets": [f"{value:,.2f}" for value in total_assets],
-        "Total Current Liabilities": [f"{value:,.2f}" for value in total_current_liabilities],
-        "Total Long-Term Debt": [f"{value:,.2f}" for value in total_long_term_debt],
-        "Total Liabilities": [f"{value:,.2f}" for value in total_liabilities],
-        "EBITDA": [f"{value:,.2f}" for value in ebitda],
-        "Net Income Before Taxes": [f"{value:,.2f}" for value in net_income_before_taxes],
-        "Net Income Before Extraordinary Items": [f"{value:,.2f}" for value in net_income_before_extraordinary_items],
-        "Revenue": [f"{value:,.2f}" for value in revenue],
-        "Total Operating Expense": [f"{value:,.2f}" for value in total_operating_expense],
-        "Net Income After Taxes": [f"{value:,.2f}" for value in net_income],
-        "ROE": [f"{value * 100:,.2f}" for value in roe],
-        "ROA": [f"{value * 100:,.2f}" for value in roa],
-        "ROS": [f"{value * 100:,.2f}" for value in ros],
-        "Income After Tax Margin": [f"{value:,.2f}" for value in income_after_tax_margin],
-        "Revenue/Total Assets": [f"{value * 100:,.2f}" for value in revenue_to_total_assets],
-        "Long Term Debt/Equity": [f"{value * 100:,.2f}" for value in long_term_debt_to_equity],
-        "Total Debt/Equity": [f"{value * 100:,.2f}" for value in total_debt_to_equity],
-    })
+def compute_ratios(labels, get_values, size):
+    """Compute every ratio column from a label -> values lookup"""
+    frozen_labels = tuple((key, tuple(label_list)) for key, label_list in labels.items())
+    return evaluate_ratio_plan(get_ratio_plan(frozen_labels), get_values, size)
 
+def ratios_frame(years, ratios):
+    financial_ratios = pd.DataFrame(ratios, dtype=float)
+    financial_ratios.insert(0, "Năm", [str(year) for year in years])
     return financial_ratios
 
+def format_ratio_value(value, fmt="{:,.2f}"):
+    # Chỉ định dạng số khi vẽ bảng hoặc xuất file
+    return fmt.format(value) if isinstance(value, numbers.Number) else str(value)
+
+def format_financial_ratios(financial_ratios, fmt="{:,.2f}"):
+    formatted = financial_ratios.copy()
+    for col in formatted.columns[1:]:
+        formatted[col] = [format_ratio_value(value, fmt) for value in formatted[col]]
+    return formatted
+
+def export_financial_ratios(financial_ratios, path="financial_ratios.csv"):
+    financial_ratios.to_csv(path, index=False, float_format="%.2f")
+
+def calculate_financial_ratios(transposed_df, labels):
+    years = transposed_df.columns[1:]
+    rows = transposed_df.set_index("Chỉ tiêu")
+
+    def get_values(label):
+        return rows.loc[label].values.astype(float) if label in rows.index else np.zeros(len(years))
+
+    return ratios_frame(years, compute_ratios(labels, get_values, len(years)))
+
+def build_panel(dfs, years=range(2020, 2025)):
+    """Stack the yearly frames into one frame indexed by (ticker, year)"""
+    frames = []
+    for df, year in zip(dfs, years):
+        df = standardize_columns(df)
+        if 'MÃ' not in df.columns:
+            print(f"LỖI: Cột 'MÃ' không tồn tại trong file năm {year}")
+            continue
+        df = df.drop_duplicates('MÃ').rename(columns={'MÃ': 'Mã'})
+        df['Năm'] = str(year)
+        frames.append(df.set_index(['Mã', 'Năm']))
+    return pd.concat(frames) if frames else pd.DataFrame()
+
+def calculate_ratio_panel(dfs, labels, years=range(2020, 2025)):
+    """Compute every ratio for all tickers and years in one vectorised pass"""
+    panel = build_panel(dfs, years)
+
+    def get_values(label):
+        if label not in panel.columns:
+            return np.zeros(len(panel))
+        return pd.to_numeric(panel[label], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+    return pd.DataFrame(compute_ratios(labels, get_values, len(panel)), index=panel.index)
+
+def ticker_ratios(ratio_panel, stock_code):
+    """Slice one ticker out of the ratio panel, shaped like calculate_financial_ratios"""
+    if stock_code not in ratio_panel.index.get_level_values('Mã'):
+        raise ValueError(f"Không tìm thấy mã {stock_code} trong dữ liệu tài chính.")
+    rows = ratio_panel.xs(stock_code, level='Mã')
+    return ratios_frame(rows.index, {name: rows[name].to_numpy() for name in rows.columns})
+
 def display_financial_data_table(data, table_name):
     # Tạo DataFrame từ dữ liệu
     financial_data_df = pd.DataFrame(data)
@@ -180,6 +157,37 @@ labels = {
     "other_income": ["KQKD. LỢI NHUẬN KHÁC"]
 }
 
+# Chỉ tiêu trung gian, tính một lần và dùng chung cho các tỷ lệ bên dưới
+intermediate_definitions = {
+    "ebitda": "net_income + interest_expense + taxes + depreciation_amortization",
+    "net_income_before_taxes": "operating_profit + other_profit + jv_profit",
+    "net_income_before_extraordinary_items": "net_income + other_income",
+    "total_operating_expense": "revenue - gross_profit + financial_expense + selling_expense + admin_expense",
+}
+
+# Tên cột kết quả -> biểu thức trên các khóa của labels (phép chia an toàn, mẫu = 0 thì trả 0)
+ratio_definitions = {
+    "Total Current Assets": "total_current_assets",
+    "Property/Plant/Equipment": "ppe",
+    "Total Assets": "total_assets",
+    "Total Current Liabilities": "total_current_liabilities",
+    "Total Long-Term Debt": "total_long_term_debt",
+    "Total Liabilities": "total_liabilities",
+    "EBITDA": "ebitda",
+    "Net Income Before Taxes": "net_income_before_taxes",
+    "Net Income Before Extraordinary Items": "net_income_before_extraordinary_items",
+    "Revenue": "revenue",
+    "Total Operating Expense": "total_operating_expense",
+    "Net Income After Taxes": "net_income",
+    "ROE": "net_income / total_equity * 100",
+    "ROA": "net_income / total_assets * 100",
+    "ROS": "net_income / revenue * 100",
+    "Income After Tax Margin": "net_income / revenue",
+    "Revenue/Total Assets": "revenue / total_assets * 100",
+    "Long Term Debt/Equity": "total_long_term_debt / total_equity * 100",
+    "Total Debt/Equity": "total_debt / total_equity * 100",
+}
+
 file_paths = [
     r"data\2020-Vietnam.xlsx",
     r"data\2021-Vietnam.xlsx",
@@ -190,52 +198,71 @@ file_paths = [
 
 
 
-def calc_financial_ratios():
-    start_column = "Trạng thái kiểm toán"
-    start_column_clean = start_column.replace("Hợp nhất", "").replace("Hàng năm", "").strip()
-    stock_code = "MWG"
-    dfs = load_all_data(file_paths, start_column_clean)
-    merged_df = merge_df(dfs, stock_code)
-    merged_df = merged_df.loc[:, ~merged_df.columns.str.contains("CURRENT RATIO", case=False)]
-    transposed_df = transpose_data(merged_df)
-    #transposed_df
-
-    financial_ratios = calculate_financial_ratios(transposed_df, labels)
-    return financial_ratios
-
-financial_ratios = calc_financial_ratios()
-
-# Alternatively, output to CSV
-financial_ratios.to_csv('financial_ratios.csv', index=False)
-# Dữ liệu bảng tài chính
-balance_sheet_data = {
-    "Total Current Assets": financial_ratios["Total Current Assets"],
-    "Property/Plant/Equipment": financial_ratios["Property/Plant/Equipment"],
-    "Total Assets": financial_ratios["Total Assets"],
-    "Total Current Liabilities": financial_ratios["Total Current Liabilities"],
-    "Total Long-Term Debt": financial_ratios["Total Long-Term Debt"],
-    "Total Liabilities": financial_ratios["Total Liabilities"]
-}
-
-income_statement_data = {
-    "Revenue": financial_ratios["Revenue"],
-    "Total Operating Expense": financial_ratios["Total Operating Expense"],
-    "Net Income Before Taxes": financial_ratios["Net Income Before Taxes"],
-    "Net Income After Taxes": financial_ratios["Net Income After Taxes"],
-    "Net Income Before Extraordinary Items": financial_ratios["Net Income Before Extraordinary Items"]
-}
-
-profitability_analysis_data = {
-    "ROE, %": financial_ratios["ROE"],
-    "ROA, %": financial_ratios["ROA"],
-    "Income After Tax Margin, %": financial_ratios["Income After Tax Margin"],
-    "Revenue/Total Assets, %": financial_ratios["Revenue/Total Assets"],
-    "Long Term Debt/Equity, %": financial_ratios["Long Term Debt/Equity"],
-    "Total Debt/Equity, %": financial_ratios["Total Debt/Equity"],
-    "ROS, %": financial_ratios["ROS"]
-}
+START_COLUMN = "Trạng thái kiểm toán"
+
+@lru_cache(maxsize=1)
+def calc_ratio_panel():
+    # Tiến trình con của báo cáo hàng loạt gắn vào bảng đã được tiến trình chính công bố, không tính lại
+    shared = attach_frame("ratio_panel")
+    if shared is not None:
+        return shared[0]
+    start_column_clean = START_COLUMN.replace("Hợp nhất", "").replace("Hàng năm", "").strip()
+    # Chỉ đọc các cột có trong labels thay vì toàn bộ sheet
+    dfs = load_all_data(file_paths, start_column_clean, columns=needed_columns(labels))
+    return calculate_ratio_panel(dfs, labels)
+
+def calc_financial_ratios(stock_code="MWG"):
+    # Lấy một mã từ bảng toàn thị trường, không tính lại
+    return ticker_ratios(calc_ratio_panel(), stock_code)
+
+def get_financial_tables(financial_ratios):
+    # Dữ liệu bảng tài chính
+    balance_sheet_data = {
+        "Total Current Assets": financial_ratios["Total Current Assets"],
+        "Property/Plant/Equipment": financial_ratios["Property/Plant/Equipment"],
+        "Total Assets": financial_ratios["Total Assets"],
+        "Total Current Liabilities": financial_ratios["Total Current Liabilities"],
+        "Total Long-Term Debt": financial_ratios["Total Long-Term Debt"],
+        "Total Liabilities": financial_ratios["Total Liabilities"]
+    }
+
+    income_statement_data = {
+        "Revenue": financial_ratios["Revenue"],
+        "Total Operating Expense": financial_ratios["Total Operating Expense"],
+        "Net Income Before Taxes": financial_ratios["Net Income Before Taxes"],
+        "Net Income After Taxes": financial_ratios["Net Income After Taxes"],
+        "Net Income Before Extraordinary Items": financial_ratios["Net Income Before Extraordinary Items"]
+    }
+
+    profitability_analysis_data = {
+        "ROE, %": financial_ratios["ROE"],
+        "ROA, %": financial_ratios["ROA"],
+        "Income After Tax Margin, %": financial_ratios["Income After Tax Margin"],
+        "Revenue/Total Assets, %": financial_ratios["Revenue/Total Assets"],
+        "Long Term Debt/Equity, %": financial_ratios["Long Term Debt/Equity"],
+        "Total Debt/Equity, %": financial_ratios["Total Debt/Equity"],
+        "ROS, %": financial_ratios["ROS"]
+    }
+
+    return {
+        "balance_sheet_data": balance_sheet_data,
+        "income_statement_data": income_statement_data,
+        "profitability_analysis_data": profitability_analysis_data,
+    }
+
+def __getattr__(name):
+    # Import module không tính toán gì; dữ liệu chỉ được nạp khi truy cập lần đầu
+    if name == "financial_ratios":
+        return calc_financial_ratios()
+    if name in ("balance_sheet_data", "income_statement_data", "profitability_analysis_data"):
+        return get_financial_tables(calc_financial_ratios())[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 #Hiển thị bảng cho mỗi loại dữ liệu
 #display_financial_data_table(balance_sheet_data , "BẢNG CÂN ĐỐI KẾ TOÁN")
 #display_financial_data_table(income_statement_data, "BÁO CÁO KẾT QUẢ KINH DOANH")
-#display_financial_data_table(profitability_analysis_data, "PHÂN TÍCH HIỆU SUẤT SINH LỜI")
\ No newline at end of file
+#display_financial_data_table(profitability_analysis_data, "PHÂN TÍCH HIỆU SUẤT SINH LỜI")
+
+if __name__ == "__main__":
+    # Alternatively, output to CSV
+    export_financial_ratios(calc_financial_ratios(), 'financial_ratios.csv')
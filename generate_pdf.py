@@ -2,6 +2,15 @@
 import textwrap
 from datetime import datetime
 import base64
+import json
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import openai
 from openai import OpenAI
 import os
 import dotenv
@@ -11,131 +20,354 @@ dotenv.load_dotenv()
 
 # Third party imports
 import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.ticker import FuncFormatter
-from matplotlib.dates import DateFormatter
-from reportlab.pdfgen import canvas
+from reportlab.graphics import renderPDF
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.colors import HexColor, black
 from reportlab.lib.units import mm
-from reportlab.lib.utils import ImageReader
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from vnstock import *
 
 # Local imports
-from financial_ratio import calc_financial_ratios
+from financial_ratio import calc_financial_ratios, format_ratio_value
 from test_info import get_company_info, get_mwg_info, get_mwg_intro, get_close_price_on_date, get_financial_sumary, calculate_percentage_changes
-from marketcap import get_market_value
+from marketcap import get_market_value, get_sector_marketcap, get_ticker_sector, plot_marketcap
+from price_store import get_price_history, prefetch_history
+from task_graph import TaskGraph
+from analysis_cache import analysis_key, load_analysis, save_analysis
+from image_payload import AI_IMAGE_FORMAT, AI_IMAGE_MAX_PIXELS, encode_for_upload
+from local_commentary import chart_commentary, profitability_commentary
+from vector_charts import price_chart_drawing
+from chart_service import ChartService, assets_chart, price_chart, profitability_chart, structure_chart
+from render_cache import cached_render, render_stats
+from pdf_output import PDF_SIZE_REPORT, binary_streams, draw_placed_image, pdf_size_report, report_canvas
 
 # Constants
 CHART_PATH_6M = "chart_image/6month.png"
 CHART_PATH_5Y = "chart_image/5year.png"
 CHART_PATH_PIE = "chart_image/piechar.png"
 CHART_PATH_MARKET = "chart_image/maketcap.png"
+CHART_PATH_ASSETS = "chart_image/taisan & no.png"
+CHART_PATH_PROFIT = "chart_image/roa_roe_ros.png"
+CHART_PATH_MATCHED = "chart_image/Khop_lenhNĐT.png"
+CHART_PATH_NEGOTIATED = "chart_image/Thoa_thuanNĐT.png"
+# Loại nhận xét dự phòng (local_commentary) của các biểu đồ được AI phân tích, theo thứ tự trong báo cáo
+ANALYSIS_KINDS = ("assets", "profitability", "trading", "structure", "market")
+# CHART_RENDERER=vector vẽ biểu đồ giá trực tiếp lên PDF bằng ReportLab (không qua PNG)
+CHART_RENDERER = os.getenv("CHART_RENDERER", "png")
+CHART_SIZE = (90 * mm, 60 * mm)
+# Ảnh nào do tác vụ nào vẽ ra: phân tích chỉ bắt đầu khi ảnh đã có
+CHART_TASKS = {"6m": "charts", "5y": "charts", "assets": "ratio_charts", "profitability": "ratio_charts",
+               "structure": "ratio_charts", "market": "market_chart"}
+
+# Giới hạn số lời gọi AI đồng thời và số lần thử lại khi bị giới hạn tốc độ
+AI_CONCURRENCY = int(os.getenv("AI_CONCURRENCY", "3"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "4"))
+RETRYABLE_AI_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+_ai_slots = threading.BoundedSemaphore(AI_CONCURRENCY)
+# ANALYSIS_REFRESH=1 bỏ qua cache và gọi lại AI cho mọi biểu đồ
+ANALYSIS_REFRESH = os.getenv("ANALYSIS_REFRESH", "") == "1"
+
+AI_MODEL = "meta-llama/llama-4-maverick:free"
+SYSTEM_PROMPT = "You are a seasoned financial analyst with expertise in interpreting financial charts and metrics. Provide professional, insightful analysis focusing on key trends, potential implications, and actionable insights."
+ANALYSIS_PROMPT = ("As a financial expert, please analyze this chart in approximately 120 words, return in Vietnamese paragraph, no format. Include:\n"
+                   "1. Key trends and patterns\n"
+                   "2. Important financial metrics and their implications\n"
+                   "3. Notable market insights\n"
+                   "4. Potential impact on investment decisions\n"
+                   "Keep the analysis concise, professional, and focused on the most significant aspects.")
+BATCH_PROMPT = ("You will receive {count} charts, each preceded by its chart id. Analyze every chart separately "
+                "following the instructions above. Return ONLY a JSON object mapping each chart id to its "
+                "analysis paragraph, for example {{\"chart_1\": \"...\", \"chart_2\": \"...\"}}.")
+# AI_BATCH=0 tắt chế độ gộp, gửi mỗi biểu đồ một yêu cầu
+AI_BATCH = os.getenv("AI_BATCH", "1") == "1"
+# Tổng thời gian (giây) dành cho các phần phân tích AI của một báo cáo
+AI_BUDGET_SECONDS = float(os.getenv("AI_BUDGET_SECONDS", "90"))
+ANALYSIS_ERROR_PREFIX = "Error analyzing chart"
+
 FONT_PATH_REGULAR = 'Roboto-Regular.ttf'
 FONT_PATH_BOLD = 'Roboto-Bold.ttf'
 PAGE_MARGIN = 10 * mm
 SYMBOL = "MWG"
 DATE_TARGET = "2024-12-31"
+REPORT_PATH = "K224141709_Hồ Nguyễn Nhật Vy_MWG_1.pdf"
+MWG_MARKETCAP_LABEL = "MOBILE WORLD INVESTMENT - MARKET VALUE"
 WIDTH, HEIGHT = A4
 
+class ReportJob:
+    """What differs between the reports of two tickers: symbol, date, output file and chart images.
+
+    Without chart_dir the job uses the prepared chart images of the original
+    MWG report. With chart_dir the ratio and market-cap charts are rendered
+    for the job's own ticker into that folder.
+    """
+
+    def __init__(self, symbol=SYMBOL, date_target=DATE_TARGET, output_path=None, chart_dir=None):
+        self.symbol = symbol.upper()
+        self.date_target = date_target
+        self.output_path = output_path or (REPORT_PATH if self.symbol == SYMBOL else f"{self.symbol}_{date_target}.pdf")
+        self.rendered = chart_dir is not None
+        if self.rendered:
+            os.makedirs(chart_dir, exist_ok=True)
+            self.charts = {key: os.path.join(chart_dir, f"{key}.png")
+                           for key in ("6m", "5y", "assets", "profitability", "structure", "market")}
+        else:
+            self.charts = {"6m": CHART_PATH_6M, "5y": CHART_PATH_5Y, "assets": CHART_PATH_ASSETS,
+                           "profitability": CHART_PATH_PROFIT, "structure": CHART_PATH_PIE, "market": CHART_PATH_MARKET}
+        # Khớp lệnh/thỏa thuận theo nhà đầu tư là số liệu toàn thị trường nên mọi mã dùng chung ảnh
+        self.charts.update(trading=CHART_PATH_MATCHED, negotiated=CHART_PATH_NEGOTIATED)
+
+    @property
+    def title(self):
+        return "THẾ GIỚI DI ĐỘNG-MWG" if self.symbol == "MWG" else self.symbol
+
+    @property
+    def marketcap_label(self):
+        return MWG_MARKETCAP_LABEL if self.symbol == "MWG" else self.symbol
+
+    @property
+    def analysis_charts(self):
+        return [self.charts[kind] for kind in ANALYSIS_KINDS]
+
+    def commentary_kind(self, path):
+        return next((kind for kind in ANALYSIS_KINDS if self.charts[kind] == path), None)
+
+    def chart_task(self, key):
+        """Graph task that renders a chart image, or None for prepared images"""
+        if key in ("6m", "5y") or self.rendered:
+            return CHART_TASKS.get(key)
+        return None
+
 def setup_fonts():
     """Register custom fonts"""
     pdfmetrics.registerFont(TTFont('Roboto', FONT_PATH_REGULAR))
     pdfmetrics.registerFont(TTFont('Roboto-Bold', FONT_PATH_BOLD))
 
-def analyze_chart(image_path):
+@lru_cache(maxsize=1)
+def get_ai_client():
+    """OpenAI client configured for OpenRouter, shared by all analyses"""
+    # Tự xử lý thử lại bên dưới để tôn trọng Retry-After và giới hạn đồng thời
+    return OpenAI(
+        base_url="https://openrouter.ai/api/v1",
+        api_key=os.getenv("OPENROUTER_API_KEY"),
+        max_retries=0,
+    )
+
+def retry_delay(error, attempt):
+    """Seconds to wait before retrying: the server's Retry-After, else exponential backoff"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return min(60.0, 2 ** attempt) + random.uniform(0, 1)
+
+def read_chart(image_path):
+    """Bytes of a chart image and its analysis-cache key"""
+    with open(image_path, "rb") as image_file:
+        image_bytes = image_file.read()
+    # Cấu hình nén ảnh ảnh hưởng tới thứ AI nhìn thấy nên cũng là một phần của khóa
+    upload_settings = f"{AI_IMAGE_MAX_PIXELS}:{AI_IMAGE_FORMAT}"
+    return image_bytes, analysis_key(image_bytes, AI_MODEL, SYSTEM_PROMPT, ANALYSIS_PROMPT, upload_settings)
+
+def remaining_time(deadline):
+    """Seconds left before a time.monotonic() deadline (None = no limit)"""
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Hết thời gian dành cho phân tích AI")
+    return remaining
+
+def call_with_retry(request, *args, deadline=None):
+    """Run request(*args) under the AI concurrency cap, retrying rate limits and transient errors.
+
+    With a deadline, each attempt gets only the time left and no retry is
+    scheduled past it.
+    """
+    for attempt in range(AI_MAX_RETRIES + 1):
+        remaining = remaining_time(deadline)
+        # timeout=None chờ đến khi có lượt (timeout=-1 của Semaphore lại không chờ)
+        if not _ai_slots.acquire(timeout=remaining):
+            raise TimeoutError("Hết thời gian chờ lượt gọi AI")
+        try:
+            return request(*args, timeout=remaining_time(deadline))
+        except RETRYABLE_AI_ERRORS as e:
+            delay = retry_delay(e, attempt)
+            if attempt == AI_MAX_RETRIES or (deadline is not None and time.monotonic() + delay >= deadline):
+                raise
+        finally:
+            _ai_slots.release()
+        # Chờ ngoài semaphore để các phân tích khác không bị chặn
+        time.sleep(delay)
+
+def analyze_chart(image_path, refresh=None, deadline=None):
     """
     Analyze a chart image using OpenRouter's AI model from a financial expert perspective.
     
     Args:
         image_path (str): Path to the chart image file
+        refresh (bool): Ignore a cached analysis of the same image/prompt/model
+        deadline (float): time.monotonic() value after which the call gives up
         
     Returns:
         str: ~200 word financial expert analysis of the chart's content and patterns
     """
+    refresh = ANALYSIS_REFRESH if refresh is None else refresh
     try:
-        # Read and encode the image
-        with open(image_path, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-        
-        # Initialize OpenAI client with OpenRouter configuration
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=os.getenv("OPENROUTER_API_KEY"),
-        )
-        
-        # Create completion request with specific financial expert prompt
-        completion = client.chat.completions.create(
-            model="meta-llama/llama-4-maverick:free",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a seasoned financial analyst with expertise in interpreting financial charts and metrics. Provide professional, insightful analysis focusing on key trends, potential implications, and actionable insights."
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "As a financial expert, please analyze this chart in approximately 120 words, return in Vietnamese paragraph, no format. Include:\n"
-                                  "1. Key trends and patterns\n"
-                                  "2. Important financial metrics and their implications\n"
-                                  "3. Notable market insights\n"
-                                  "4. Potential impact on investment decisions\n"
-                                  "Keep the analysis concise, professional, and focused on the most significant aspects."
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ]
-        )
-        
-        # Return the analysis
-        return completion.choices[0].message.content
+        image_bytes, key = read_chart(image_path)
+        cached = None if refresh else load_analysis(key)
+        if cached is not None:
+            return cached
+
+        payload, mime_type = encode_for_upload(image_bytes)
+        started = time.perf_counter()
+        analysis = call_with_retry(request_chart_analysis, payload, mime_type, deadline=deadline)
+        print(f"AI {os.path.basename(image_path)}: {len(image_bytes) / 1024:.0f} KB -> "
+              f"{len(payload) / 1024:.0f} KB ({mime_type}), {time.perf_counter() - started:.1f}s")
+        # Chỉ lưu kết quả thành công, lỗi không được cache
+        if analysis:
+            save_analysis(key, analysis, model=AI_MODEL, image=os.path.basename(image_path))
+        return analysis
         
     except Exception as e:
-        return f"Error analyzing chart: {str(e)}"
+        return f"{ANALYSIS_ERROR_PREFIX}: {str(e)}"
+
+def analyze_charts(image_paths, refresh=None, deadline=None):
+    """
+    Analyze several charts with one batched request.
+
+    Cached charts are skipped. If the batched answer cannot be parsed (or the
+    request fails), the remaining charts are analyzed one call per chart.
+
+    Returns:
+        dict: image path -> analysis text
+    """
+    refresh = ANALYSIS_REFRESH if refresh is None else refresh
+    results = {}
+    pending = []
+    for path in image_paths:
+        try:
+            image_bytes, key = read_chart(path)
+        except OSError as e:
+            results[path] = f"{ANALYSIS_ERROR_PREFIX}: {str(e)}"
+            continue
+        cached = None if refresh else load_analysis(key)
+        if cached is not None:
+            results[path] = cached
+        else:
+            pending.append((path, image_bytes, key))
+
+    if len(pending) > 1:
+        parsed = None
+        try:
+            charts = [(f"chart_{i}", *encode_for_upload(image_bytes))
+                      for i, (_, image_bytes, _) in enumerate(pending, 1)]
+            started = time.perf_counter()
+            answer = call_with_retry(request_batch_analysis, charts, deadline=deadline)
+            print(f"AI gộp {len(charts)} biểu đồ: {sum(len(c[1]) for c in charts) / 1024:.0f} KB, "
+                  f"{time.perf_counter() - started:.1f}s")
+            parsed = parse_batch_analysis(answer, [chart[0] for chart in charts])
+        except Exception as e:
+            print(f"Phân tích gộp lỗi: {e}")
+        if parsed:
+            for (chart_id, _, _), (path, _, key) in zip(charts, pending):
+                results[path] = parsed[chart_id]
+                save_analysis(key, parsed[chart_id], model=AI_MODEL, image=os.path.basename(path), batched=True)
+            pending = []
+        else:
+            print("Không dùng được kết quả gộp, phân tích từng biểu đồ")
+
+    if pending:
+        paths = [path for path, _, _ in pending]
+        with ThreadPoolExecutor(max_workers=AI_CONCURRENCY) as pool:
+            results.update(zip(paths, pool.map(lambda path: analyze_chart(path, refresh, deadline), paths)))
+    return {path: results[path] for path in image_paths}
+
+def parse_batch_analysis(answer, chart_ids):
+    """Per-chart analyses from a batched JSON answer, or None if any chart is missing"""
+    match = re.search(r"\{.*\}", answer or "", re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    analyses = {chart_id: data.get(chart_id) for chart_id in chart_ids}
+    if not all(isinstance(text, str) and text.strip() for text in analyses.values()):
+        return None
+    return {chart_id: text.strip() for chart_id, text in analyses.items()}
+
+def request_batch_analysis(charts, timeout=None):
+    """Send (chart id, image bytes, MIME type) charts in one completion and return the raw answer"""
+    content = [{
+        "type": "text",
+        "text": ANALYSIS_PROMPT + "\n\n" + BATCH_PROMPT.format(count=len(charts))
+    }]
+    for chart_id, image_bytes, mime_type in charts:
+        base64_image = base64.b64encode(image_bytes).decode('utf-8')
+        content.append({"type": "text", "text": f"Chart id: {chart_id}"})
+        content.append({"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{base64_image}"}})
+
+    completion = get_ai_client().with_options(timeout=timeout or 600).chat.completions.create(
+        model=AI_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": content}
+        ]
+    )
+    return completion.choices[0].message.content
+
+def request_chart_analysis(image_bytes, mime_type="image/png", timeout=None):
+    """Send one chart image to the model and return its analysis text"""
+    base64_image = base64.b64encode(image_bytes).decode('utf-8')
+
+    # Create completion request with specific financial expert prompt
+    completion = get_ai_client().with_options(timeout=timeout or 600).chat.completions.create(
+        model=AI_MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": ANALYSIS_PROMPT
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{mime_type};base64,{base64_image}"
+                        }
+                    }
+                ]
+            }
+        ]
+    )
+
+    # Return the analysis
+    return completion.choices[0].message.content
 
 
 def plot_stock_price_chart(symbol=SYMBOL, period="6m", start_date="2020-01-01", end_date="2024-12-31", save_path=None):
     """Generate and save stock price chart"""
-    stock = Vnstock().stock(symbol, source="VCI")
-    df = stock.quote.history(start=start_date, end=end_date, interval="1D")
+    df = get_price_history(symbol, start_date, end_date)
     
     if df is None or df.empty:
         print(f"Không thể lấy dữ liệu cho mã {symbol}")
         return
 
-    df["time"] = pd.to_datetime(df["time"])
-    plt.figure(figsize=(5, 3))
-
-    if period == "6m":
-        df_filtered = df[(df["time"] >= "2024-07-01") & (df["time"] <= "2024-12-31")]
-        plt.plot(df_filtered["time"], df_filtered["close"], label="Giá đóng cửa", color="blue")
-        plt.xticks(pd.date_range(start="2024-07-01", end="2024-12-31", freq="MS"),
-                  labels=pd.date_range(start="2024-07-01", end="2024-12-31", freq="MS").strftime('%m/%Y'))
-        plt.title(f"{symbol} - 6 tháng", loc="left", fontsize=10)
-    else:  # 5y
-        plt.plot(df["time"], df["close"], label="Giá đóng cửa", color="blue")
-        plt.gca().xaxis.set_major_formatter(DateFormatter("%Y"))
-        plt.xticks(pd.date_range(start="2020-01-01", end="2024-12-31", freq="YS"),
-                  labels=pd.date_range("2020-01-01", "2024-12-31", freq="YS").strftime("%Y"))
-        plt.title(f"{symbol} - 5 năm", loc="left", fontsize=10)
-
-    plt.gca().yaxis.set_major_formatter(FuncFormatter(lambda x, _: f"{x:.3f}"))
-    plt.grid(True)
-    plt.tight_layout()
-
-    if save_path:
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
-    plt.close()
+    return cached_render(price_chart, df, symbol, period, save_path=save_path)
 
 def draw_wrapped_text(c, text, x, y, width=100, font="Roboto", font_size=11, leading=14):
     """Draw text with automatic line wrapping"""
@@ -176,8 +408,8 @@ def draw_table_header(c, x, y, col_labels, title_col_width, data_col_width, row_
         )
     return y - row_height
 
-def draw_table_from_dict(c, data_dict, x, y, row_height=20, section_title=None):
-    """Draw table from dictionary data"""
+def draw_table_from_dict(c, data_dict, x, y, row_height=20, section_title=None, value_format="{:,.2f}"):
+    """Draw table from dictionary data, formatting numbers only here"""
     table_width = WIDTH - 2 * PAGE_MARGIN
     col_labels = list(data_dict.values())[0].index.tolist()
     
@@ -211,7 +443,7 @@ def draw_table_from_dict(c, data_dict, x, y, row_height=20, section_title=None):
         c.drawString(x + 4, y - row_height + 5, label)
         
         for i, val in enumerate(values):
-            val_str = f"{val:,.0f}" if isinstance(val, (int, float)) else str(val)
+            val_str = format_ratio_value(val, value_format)
             c.drawRightString(
                 x + title_col_width + (i * data_col_width) + data_col_width - 4,
                 y - row_height + 5,
@@ -223,7 +455,10 @@ def draw_table_from_dict(c, data_dict, x, y, row_height=20, section_title=None):
 
 def prepare_financial_data(financial_ratios):
     """Prepare financial data tables"""
-    def create_table(data, years=range(2020, 2025)):
+    # Cột theo các năm mã thực sự có dữ liệu; mã niêm yết sau 2020 có ít hơn 5 năm
+    years = financial_ratios["Năm"].tolist()
+
+    def create_table(data):
         df = pd.DataFrame(data).T
         df.columns = [str(year) for year in years]
         return {row_label: pd.Series(row.values, index=df.columns) for row_label, row in df.iterrows()}
@@ -257,11 +492,11 @@ def prepare_financial_data(financial_ratios):
 
     return balance_sheet, income_statement, profitability
 
-def get_stock_details(symbol=SYMBOL):
+def get_stock_details(symbol=SYMBOL, date_target=DATE_TARGET):
     """Get stock details including percentage changes"""
     from test_info import get_stock_data, calculate_percentage_changes
     
-    df, stock = get_stock_data(symbol, start_date="2024-01-01", end_date=DATE_TARGET)
+    df, stock = get_stock_data(symbol, start_date="2024-01-01", end_date=date_target)
     
     if df is None or df.empty:
         return None
@@ -274,7 +509,7 @@ def get_stock_details(symbol=SYMBOL):
     
     # Get beta value from test_info
     from test_info import calculate_beta
-    beta_value = calculate_beta(symbol)
+    beta_value = calculate_beta(symbol, end_date=date_target)
     
     # Get shares outstanding (placeholder - implement actual data fetching)
     shares_outstanding = "6B"  # Example value
@@ -292,7 +527,7 @@ def get_stock_details(symbol=SYMBOL):
         'Cổ phiếu lưu hành': shares_outstanding
     }
 
-def draw_financial_summary(c, y_position):
+def draw_financial_summary(c, y_position, summary_text):
     """Draw financial summary section"""
     c.showPage()  # Tạo trang mới
     y_position = HEIGHT - PAGE_MARGIN - 20
@@ -310,14 +545,13 @@ def draw_financial_summary(c, y_position):
     c.setFillColor(black)
     c.setFont("Roboto", 11)
 
-    summary_text = get_financial_sumary()
     for line in summary_text.strip().split('\n'):
         draw_wrapped_text(c, line, PAGE_MARGIN, y_position, width=95, font="Roboto", font_size=11)
         y_position -= 30  # Increased margin
 
     return y_position - 40
 
-def draw_share_details(c, details, y_position):
+def draw_share_details(c, details, y_position, summary_text=""):
     """Draw share details and percentage change tables"""
     # Draw titles for both tables
     c.setFont("Roboto-Bold", 12)
@@ -401,23 +635,51 @@ def draw_share_details(c, details, y_position):
         
         y -= row_height
     
-    y = draw_financial_summary(c, y - 10)
+    y = draw_financial_summary(c, y - 10, summary_text)
     return y
 
-def draw_header(c, price):
+def draw_header(c, price, title="THẾ GIỚI DI ĐỘNG-MWG", date_target=DATE_TARGET):
     """Draw the header section of the PDF"""
     c.setFont("Roboto-Bold", 20)
     c.setFillColor(HexColor("#E6B800"))
-    c.drawRightString(WIDTH - PAGE_MARGIN, HEIGHT - 40, "THẾ GIỚI DI ĐỘNG-MWG")
+    c.drawRightString(WIDTH - PAGE_MARGIN, HEIGHT - 40, title)
     
     c.setFont("Roboto-Bold", 18)
     c.setFillColor(black)
-    c.drawRightString(WIDTH - PAGE_MARGIN, HEIGHT - 60, DATE_TARGET)
+    c.drawRightString(WIDTH - PAGE_MARGIN, HEIGHT - 60, date_target)
     
     c.setFont("Roboto", 14)
     c.drawRightString(WIDTH - PAGE_MARGIN, HEIGHT - 75, str(price))
 
-def draw_company_info(c, y_position, market_value):
+def get_company_overview(symbol=SYMBOL):
+    """Fetch the fields shown under THÔNG TIN CHUNG"""
+    return {
+        "Sàn giao dịch": get_company_info(symbol, "exchange"),
+        "Ngành": get_company_info(symbol, "industry"),
+        "Nhân viên": get_company_info(symbol, "no_employees"),
+    }
+
+def get_company_contact(symbol=SYMBOL):
+    """Fetch the fields shown under THÔNG TIN CÔNG TY"""
+    return {
+        "Địa chỉ": get_mwg_info("Địa chỉ", symbol),
+        "Điện thoại": get_mwg_info("Điện thoại", symbol),
+        "Website": get_mwg_info("Website", symbol)
+    }
+
+def get_company_intro(symbol=SYMBOL):
+    """Business summary: the mwg.vn introduction for MWG, the Vnstock company profile otherwise"""
+    if symbol == "MWG":
+        return get_mwg_intro("https://mwg.vn")
+    return get_company_info(symbol, "company_profile")
+
+def get_financial_summary(symbol=SYMBOL, ratios=None):
+    """Text under TÌNH HÌNH TÀI CHÍNH: the written MWG summary, or one built from the ratios"""
+    if symbol == "MWG":
+        return get_financial_sumary()
+    return profitability_commentary(ratios) or ""
+
+def draw_company_info(c, y_position, market_value, company_overview, company_details):
     """Draw company information sections"""
     # Left column
     left_x = PAGE_MARGIN
@@ -431,9 +693,7 @@ def draw_company_info(c, y_position, market_value):
     y_position -= 20
 
     company_info = {
-        "Sàn giao dịch": get_company_info(SYMBOL, "exchange"),
-        "Ngành": get_company_info(SYMBOL, "industry"),
-        "Nhân viên": get_company_info(SYMBOL, "no_employees"),
+        **company_overview,
         "Vốn hóa (VND)": f"{market_value:,.0f}B" if market_value else "N/A"
     }
 
@@ -458,12 +718,6 @@ def draw_company_info(c, y_position, market_value):
     c.line(right_x, y_position_right - 5, right_x + 270, y_position_right - 5)
     y_position_right -= 20
 
-    company_details = {
-        "Địa chỉ": get_mwg_info("Địa chỉ"),
-        "Điện thoại": get_mwg_info("Điện thoại"),
-        "Website": get_mwg_info("Website")
-    }
-
     for key, value in company_details.items():
         if key == "Địa chỉ" and value:
             c.setFont("Roboto-Bold", 11)
@@ -504,7 +758,7 @@ def draw_company_info(c, y_position, market_value):
 
     return min(y_position, y_position_right)
 
-def draw_business_summary(c, y_position):
+def draw_business_summary(c, y_position, intro):
     """Draw business summary section"""
     # Draw section title
     c.setFont("Roboto-Bold", 12)
@@ -517,11 +771,24 @@ def draw_business_summary(c, y_position):
     
     c.setFillColor(black)
     c.setFont("Roboto", 11)  # Set text color to black for content
-    intro = get_mwg_intro("https://mwg.vn") or "Không có thông tin tóm tắt."
+    intro = intro or "Không có thông tin tóm tắt."
     return y_position - draw_wrapped_text(c, intro, x=PAGE_MARGIN, y=y_position, width=95, font="Roboto", font_size=11) - 20
 
-def draw_charts(c, y_position):
-    """Draw stock price charts"""
+def draw_chart_image(c, graph, job, key, x, y, width, height):
+    """Place one chart image of the job once its rendering task is done; leave the space blank if it failed"""
+    task = job.chart_task(key)
+    if task:
+        try:
+            graph.result(task)
+        except Exception as e:
+            print(f"Không vẽ được biểu đồ {key} cho mã {job.symbol}: {e}")
+    if not os.path.exists(job.charts[key]):
+        print(f"Không có ảnh biểu đồ {job.charts[key]}")
+        return
+    draw_placed_image(c, job.charts[key], x, y, width, height)
+
+def draw_charts(c, y_position, graph, job, drawings=None):
+    """Draw stock price charts (vector drawings when given, else the saved PNGs)"""
     # Draw chart titles
     c.setFont("Roboto-Bold", 12)
     c.setFillColor(HexColor("#E6B800"))
@@ -536,44 +803,133 @@ def draw_charts(c, y_position):
 
     # Draw charts
     y_position -= 10
-    chart_width = 90 * mm
-    chart_height = 60 * mm
+    chart_width, chart_height = CHART_SIZE
     
-    c.drawImage(ImageReader(CHART_PATH_6M), PAGE_MARGIN, y_position - chart_height, 
-                width=chart_width, height=chart_height)
-    c.drawImage(ImageReader(CHART_PATH_5Y), 105 * mm, y_position - chart_height,
-                width=chart_width, height=chart_height)
+    if drawings:
+        renderPDF.draw(drawings["6m"], c, PAGE_MARGIN, y_position - chart_height)
+        renderPDF.draw(drawings["5y"], c, 105 * mm, y_position - chart_height)
+        return y_position - (chart_height + 10)
+
+    draw_chart_image(c, graph, job, "6m", PAGE_MARGIN, y_position - chart_height, chart_width, chart_height)
+    draw_chart_image(c, graph, job, "5y", 105 * mm, y_position - chart_height, chart_width, chart_height)
                 
     return y_position - (chart_height + 10)
 
-def main():
-    # Initialize
-    setup_fonts()
-    financial_ratios = calc_financial_ratios()    
-    # Generate charts
-    plot_stock_price_chart(period="6m", save_path=CHART_PATH_6M)
-    plot_stock_price_chart(period="5y", save_path=CHART_PATH_5Y)
+def plot_price_charts(chart_service, job):
+    """Render both price charts, as PNGs in parallel worker processes or as vector drawings.
 
-    # Prepare financial data
-    balance_sheet, income_statement, profitability = prepare_financial_data(financial_ratios)
-    
+    Returns the drawings when CHART_RENDERER is "vector", else None.
+    """
+    df = get_price_history(job.symbol, "2020-01-01", job.date_target)
+    if df is None or df.empty:
+        print(f"Không thể lấy dữ liệu cho mã {job.symbol}")
+        return None
+    if CHART_RENDERER == "vector":
+        return {period: price_chart_drawing(df, job.symbol, period, *CHART_SIZE, font="Roboto")
+                for period in ("6m", "5y")}
+    futures = [chart_service.render(price_chart, df, job.symbol, period, save_path=job.charts[period])
+               for period in ("6m", "5y")]
+    for future in futures:
+        future.result()
+    return None
+
+def plot_ratio_charts(chart_service, job, ratios):
+    """Render the balance-sheet, profitability and asset-structure charts of the job's ticker"""
+    futures = [chart_service.render(renderer, ratios, job.symbol, save_path=job.charts[key])
+               for key, renderer in (("assets", assets_chart), ("profitability", profitability_chart),
+                                     ("structure", structure_chart))]
+    for future in futures:
+        future.result()
+
+def plot_market_chart(chart_service, job):
+    """Market caps of the ticker's ICB sector with the ticker highlighted"""
+    sector = get_ticker_sector(job.symbol)
+    if sector is None:
+        raise ValueError(f"Không tìm thấy ngành ICB của mã {job.symbol}")
+    date = pd.Timestamp(job.date_target)
+    df_sector = get_sector_marketcap(*sector, start_date=job.date_target,
+                                     end_date=(date + pd.Timedelta(days=1)).strftime("%Y-%m-%d"))
+    return plot_marketcap(df_sector, job.date_target, job.charts["market"], highlight=job.symbol,
+                          title=f"Vốn hóa các cổ phiếu ngành {sector[1]} - {date:%d/%m/%Y}",
+                          chart_service=chart_service)
+
+def add_report_tasks(graph, job=None, deadline=None, chart_service=None):
+    """Declare every remote/slow input of the report and what it depends on"""
+    job = job or ReportJob()
+    symbol, date_target = job.symbol, job.date_target
+    # Tải trước lịch sử giá một lần cho mọi khung thời gian dùng trong báo cáo
+    graph.add("prices", lambda: prefetch_history(symbol, [("2020-01-01", date_target), ("2024-01-01", date_target)]))
+    graph.add("market_prices", lambda: prefetch_history("VNINDEX", [("2024-01-01", date_target)]))
+    chart_service = chart_service or ChartService(workers=1)
+    graph.add("charts", lambda _: plot_price_charts(chart_service, job), deps=("prices",))
+    graph.add("price", lambda _: get_close_price_on_date(symbol, date_target), deps=("prices",))
+    graph.add("stock_details", lambda *_: get_stock_details(symbol, date_target), deps=("prices", "market_prices"))
+
+    graph.add("ratios", lambda: calc_financial_ratios(symbol))
+    graph.add("tables", prepare_financial_data, deps=("ratios",))
+    graph.add("summary", lambda ratios: get_financial_summary(symbol, ratios), deps=("ratios",))
+    if job.rendered:
+        graph.add("ratio_charts", lambda ratios: plot_ratio_charts(chart_service, job, ratios), deps=("ratios",))
+        graph.add("market_chart", lambda: plot_market_chart(chart_service, job))
+    graph.add("market_value", lambda: get_market_value(date_target=date_target, row_label=job.marketcap_label))
+
+    graph.add("company_overview", lambda: get_company_overview(symbol))
+    graph.add("company_details", lambda: get_company_contact(symbol))
+    graph.add("intro", lambda: get_company_intro(symbol))
+
+    if AI_BATCH:
+        # Một yêu cầu cho mọi biểu đồ, chờ tất cả ảnh được vẽ xong
+        deps = tuple(sorted({job.chart_task(kind) for kind in ANALYSIS_KINDS} - {None}))
+        graph.add("analyses", lambda *_: analyze_charts(job.analysis_charts, deadline=deadline), deps=deps)
+        for path in job.analysis_charts:
+            graph.add(f"analysis:{path}", lambda analyses, path=path: analyses[path], deps=("analyses",))
+        return
+
+    # Phân tích AI chạy song song (tối đa AI_CONCURRENCY lời gọi cùng lúc)
+    for kind, path in zip(ANALYSIS_KINDS, job.analysis_charts):
+        deps = (job.chart_task(kind),) if job.chart_task(kind) else ()
+        graph.add(f"analysis:{path}", lambda *_, path=path: analyze_chart(path, deadline=deadline), deps=deps)
+
+def section_analysis(graph, job, kind, deadline=None):
+    """AI analysis of a chart, or local commentary when it failed or missed the deadline"""
+    path = job.charts[kind]
+    try:
+        timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+        analysis = graph.result(f"analysis:{path}", timeout=timeout)
+    except Exception:
+        analysis = None
+    if analysis and not analysis.startswith(ANALYSIS_ERROR_PREFIX):
+        return analysis
+
+    def optional(name):
+        try:
+            return graph.result(name)
+        except Exception:
+            return None
+
+    return chart_commentary(kind, optional("ratios"),
+                            optional("stock_details"), optional("market_value"))
+
+def draw_report(graph, job=None, deadline=None):
+    """Draw the PDF in page order, waiting only on the inputs of each section"""
+    job = job or ReportJob()
     # Create PDF
-    c = canvas.Canvas("K224141709_Hồ Nguyễn Nhật Vy_MWG_1.pdf", pagesize=A4)
+    # Ảnh được lấy mẫu lại theo kích thước đặt trên trang, stream nén nhị phân
+    c = report_canvas(job.output_path, pagesize=A4)
     # Draw content
-    price = get_close_price_on_date(SYMBOL, DATE_TARGET) or "N/A"
+    price = graph.result("price") or "N/A"
     price = "{:,.3f}".format(price).replace(",", ".")
-    draw_header(c, price)
+    draw_header(c, price, job.title, job.date_target)
     
     y_position = HEIGHT - 100
     
-    # Get stock details
-    stock_details = get_stock_details()
-    
-    market_value = get_market_value(date_target=DATE_TARGET, row_label="MOBILE WORLD INVESTMENT - MARKET VALUE")
-    y_position = draw_company_info(c, y_position, market_value)
-    y_position = draw_business_summary(c, y_position - 20)  # Added margin above title
-    y_position = draw_charts(c, y_position - 20)
-    y_position = draw_share_details(c, stock_details, y_position - 20)
+    y_position = draw_company_info(c, y_position, graph.result("market_value"),
+                                   graph.result("company_overview"), graph.result("company_details"))
+    y_position = draw_business_summary(c, y_position - 20, graph.result("intro"))  # Added margin above title
+    y_position = draw_charts(c, y_position - 20, graph, job, graph.result("charts"))
+    y_position = draw_share_details(c, graph.result("stock_details"), y_position - 20, graph.result("summary"))
+
+    balance_sheet, income_statement, profitability = graph.result("tables")
 
     # Draw financial tables
     y_position = draw_table_from_dict(c, balance_sheet, PAGE_MARGIN, y_position, 
@@ -582,9 +938,8 @@ def main():
     # Draw balance sheet chart
     chart_width = WIDTH - 2 * PAGE_MARGIN
     chart_height = 60 * mm
-    c.drawImage(ImageReader("chart_image/taisan & no.png"), 
-                PAGE_MARGIN, y_position - chart_height,
-                width=chart_width, height=chart_height)
+    draw_chart_image(c, graph, job, "assets", 
+                PAGE_MARGIN, y_position - chart_height, chart_width, chart_height)
     y_position -= (chart_height + 40)
     
     # Add AI analysis section
@@ -596,7 +951,7 @@ def main():
     c.line(PAGE_MARGIN, y_position - 4, 200 * mm, y_position - 4)
     y_position -= 20
 
-    analysis = analyze_chart("chart_image/taisan & no.png")
+    analysis = section_analysis(graph, job, "assets", deadline)
     c.setFillColor(black)  # Set text color to black
     c.setFont("Roboto", 11)
     y_position -= draw_wrapped_text(c, analysis, PAGE_MARGIN, y_position, width=95,font="Roboto", font_size=11)
@@ -611,9 +966,8 @@ def main():
     # Draw ROA/ROE/ROS chart
     chart_width = WIDTH - 2 * PAGE_MARGIN
     chart_height = 60 * mm
-    c.drawImage(ImageReader("chart_image/roa_roe_ros.png"), 
-                PAGE_MARGIN, y_position - chart_height,
-                width=chart_width, height=chart_height)
+    draw_chart_image(c, graph, job, "profitability", 
+                PAGE_MARGIN, y_position - chart_height, chart_width, chart_height)
     y_position -= (chart_height + 30)
     
     # Add AI analysis for ROA/ROE/ROS
@@ -625,7 +979,7 @@ def main():
     c.line(PAGE_MARGIN, y_position - 4, 200 * mm, y_position - 4)
     y_position -= 20
 
-    analysis = analyze_chart("chart_image/roa_roe_ros.png")
+    analysis = section_analysis(graph, job, "profitability", deadline)
     c.setFillColor(black)  # Set text color to black
     c.setFont("Roboto", 11)
     y_position -= draw_wrapped_text(c, analysis, PAGE_MARGIN, y_position, width=95, font="Roboto", font_size=11)
@@ -652,12 +1006,10 @@ def main():
     chart_width = 90 * mm
     chart_height = 60 * mm
     
-    c.drawImage(ImageReader("chart_image/Khop_lenhNĐT.png"), 
-                PAGE_MARGIN, y_position - chart_height,
-                width=chart_width, height=chart_height)
-    c.drawImage(ImageReader("chart_image/Thoa_thuanNĐT.png"), 
-                105 * mm, y_position - chart_height,
-                width=chart_width, height=chart_height)
+    draw_chart_image(c, graph, job, "trading", 
+                PAGE_MARGIN, y_position - chart_height, chart_width, chart_height)
+    draw_chart_image(c, graph, job, "negotiated", 
+                105 * mm, y_position - chart_height, chart_width, chart_height)
     
     y_position -= (chart_height + 20)
     
@@ -670,7 +1022,7 @@ def main():
     c.line(PAGE_MARGIN, y_position - 4, 200 * mm, y_position - 4)
     y_position -= 20
 
-    analysis = analyze_chart("chart_image/Khop_lenhNĐT.png")
+    analysis = section_analysis(graph, job, "trading", deadline)
     c.setFillColor(black)  # Set text color to black
     c.setFont("Roboto", 11)
     y_position -= draw_wrapped_text(c, analysis, PAGE_MARGIN, y_position, width=95, font="Roboto", font_size=11)
@@ -690,9 +1042,8 @@ def main():
     chart_width = WIDTH - 2 * PAGE_MARGIN
     chart_height = 80 * mm
     
-    c.drawImage(ImageReader(CHART_PATH_PIE), 
-                PAGE_MARGIN, y_position - chart_height,
-                width=chart_width, height=chart_height)
+    draw_chart_image(c, graph, job, "structure", 
+                PAGE_MARGIN, y_position - chart_height, chart_width, chart_height)
     
     y_position -= (chart_height + 10)
     
@@ -705,7 +1056,7 @@ def main():
     c.line(PAGE_MARGIN, y_position - 4, 200 * mm, y_position - 4,)
     y_position -= 20
 
-    analysis = analyze_chart(CHART_PATH_PIE)
+    analysis = section_analysis(graph, job, "structure", deadline)
     c.setFillColor(black)  # Set text color to black
     c.setFont("Roboto", 11)
     y_position -= draw_wrapped_text(c, analysis, PAGE_MARGIN, y_position, width=95, font="Roboto", font_size=11)
@@ -729,9 +1080,8 @@ def main():
     chart_width = WIDTH - 2 * PAGE_MARGIN
     chart_height = 80 * mm
     
-    c.drawImage(ImageReader(CHART_PATH_MARKET), 
-                PAGE_MARGIN, y_position - chart_height,
-                width=chart_width, height=chart_height)
+    draw_chart_image(c, graph, job, "market", 
+                PAGE_MARGIN, y_position - chart_height, chart_width, chart_height)
     
     y_position -= (chart_height + 20)
     
@@ -744,12 +1094,34 @@ def main():
     c.line(PAGE_MARGIN, y_position - 4, 200* mm, y_position - 4)
     y_position -= 20
 
-    analysis = analyze_chart(CHART_PATH_MARKET)
+    analysis = section_analysis(graph, job, "market", deadline)
     c.setFillColor(black)  # Set text color to black
     c.setFont("Roboto", 11)
     y_position -= draw_wrapped_text(c, analysis, PAGE_MARGIN +20, y_position, width=95, font="Roboto", font_size=11)
     
     c.save()
+    if PDF_SIZE_REPORT:
+        pdf_size_report(job.output_path)
+    return job.output_path
+
+def generate_report(job=None, chart_service=None):
+    """Build one report PDF and return its path"""
+    # Hết ngân sách thời gian thì các phần AI dùng nhận xét tự động
+    deadline = time.monotonic() + AI_BUDGET_SECONDS
+    with TaskGraph() as graph:
+        add_report_tasks(graph, job, deadline, chart_service)
+        # Chỉ tắt ASCII85 trong lúc vẽ báo cáo này, các canvas khác trong tiến trình giữ cấu hình cũ
+        with binary_streams():
+            return draw_report(graph, job, deadline)
+
+def main():
+    # Initialize
+    setup_fonts()
+    # Khởi động tiến trình vẽ sớm để chạy song song với việc tải dữ liệu
+    with ChartService().start() as chart_service:
+        generate_report(ReportJob(), chart_service)
+    stats = render_stats()
+    print(f"Cache biểu đồ: {stats['hits']} lần dùng lại, {stats['misses']} lần vẽ mới, {stats['evictions']} ảnh bị xóa")
 
 if __name__ == "__main__":
     main()
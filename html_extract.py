@@ -0,0 +1,101 @@
+from bs4 import BeautifulSoup, SoupStrainer, UnicodeDammit
+
+# lxml nhanh hơn nhiều so với BeautifulSoup; không có thì chỉ parse phần cần bằng SoupStrainer
+try:
+    import lxml.html as lxml_html
+    HTML_PARSER = "lxml"
+except ImportError:
+    lxml_html = None
+    HTML_PARSER = "html.parser"
+
+PROFILE_LABELS = ["Địa chỉ", "Điện thoại", "Website"]
+
+
+def paragraph_texts(container):
+    """Text of each <p> in a BeautifulSoup container, without the text of nested <p>s"""
+    texts = {}
+    for string in container.find_all(string=True):
+        paragraph = string.find_parent("p")
+        if paragraph is not None:
+            texts.setdefault(id(paragraph), []).append(string)
+    return ["".join(parts).strip() for parts in texts.values()]
+
+
+def lxml_div(content, attr, value):
+    """First <div> whose attr is value as an lxml element, or None"""
+    if attr == "class":
+        xpath = "//div[contains(concat(' ', normalize-space(@class), ' '), concat(' ', $value, ' '))]"
+    else:
+        xpath = f"//div[@{attr}=$value]"
+    if isinstance(content, bytes):
+        # Tự nhận dạng mã hóa (ưu tiên UTF-8) thay vì để lxml đoán khi trang không khai báo charset
+        content = UnicodeDammit(content, ["utf-8"], is_html=True).unicode_markup
+    divs = lxml_html.document_fromstring(content).xpath(xpath, value=value)
+    return divs[0] if divs else None
+
+
+def soup_div(content, attr, value):
+    """First <div> whose attr is value, parsing only that div with html.parser, or None"""
+    if attr == "class":
+        # SoupStrainer so khớp với cả chuỗi class ("a intro_content"), nên phải tách từng class
+        attrs = {attr: lambda classes: classes is not None and value in classes.split()}
+    else:
+        attrs = {attr: value}
+    soup = BeautifulSoup(content, "html.parser", parse_only=SoupStrainer("div", attrs=attrs))
+    return soup.find("div")
+
+
+def div_paragraphs(content, attr, value, parser=None):
+    """Texts of the <p>s inside the first <div> whose attr is value, or None if there is none.
+
+    For attr="class", value only has to be one of the element's classes.
+    """
+    parser = parser or HTML_PARSER
+    if parser == "lxml" and lxml_html is not None:
+        div = lxml_div(content, attr, value)
+        return [p.text_content().strip() for p in div.iter("p")] if div is not None else None
+
+    container = soup_div(content, attr, value)
+    return paragraph_texts(container) if container else None
+
+
+def extract_intro(content, parser=None):
+    """Text of the first <p> of div.intro_content, or None when the page has none.
+
+    Like BeautifulSoup's get_text(strip=True): each text node is stripped and
+    the pieces are joined without a separator.
+    """
+    parser = parser or HTML_PARSER
+    if parser == "lxml" and lxml_html is not None:
+        div = lxml_div(content, "class", "intro_content")
+        paragraph = next(div.iter("p"), None) if div is not None else None
+        if paragraph is None:
+            return None
+        return "".join(text.strip() for text in paragraph.xpath(".//text()"))
+
+    container = soup_div(content, "class", "intro_content")
+    paragraph = container.find("p") if container is not None else None
+    return paragraph.get_text(strip=True) if paragraph is not None else None
+
+
+def extract_labelled_fields(content, container_id, labels, parser=None):
+    """Read 'Label: value' paragraphs inside #container_id in one pass"""
+    texts = div_paragraphs(content, "id", container_id, parser)
+    if texts is None:
+        return None
+    info = {}
+    for text in texts:
+        for key in labels:
+            if key in text:
+                info[key] = text.split(":")[-1].strip()  # Lấy phần giá trị sau dấu ":"
+    return info
+
+
+def extract_profile(content, parser=None):
+    """Address, phone and website from a Vietstock company page"""
+    info = extract_labelled_fields(content, "profile-1", PROFILE_LABELS, parser)
+    if info is None:
+        return None
+    if "Website" in info:
+        info["Website"] = f"http:{info['Website']}"  # Thêm "http:" cho website
+    return info
@@ -0,0 +1,58 @@
+import io
+import os
+
+from PIL import Image
+
+# Ngân sách điểm ảnh và định dạng cho ảnh gửi lên AI (ảnh trong PDF vẫn giữ bản gốc)
+AI_IMAGE_MAX_PIXELS = int(os.getenv("AI_IMAGE_MAX_PIXELS", "1000000"))
+AI_IMAGE_FORMAT = os.getenv("AI_IMAGE_FORMAT", "auto")  # auto | png | jpeg
+
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg"}
+
+
+def fit_pixel_budget(image, max_pixels):
+    """Downscale image (keeping its aspect ratio) so width * height <= max_pixels"""
+    width, height = image.size
+    if max_pixels <= 0 or width * height <= max_pixels:
+        return image
+    scale = (max_pixels / (width * height)) ** 0.5
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return image.resize(size, Image.LANCZOS)
+
+
+def flatten_alpha(image):
+    """RGB copy of image with any transparency composited onto white"""
+    if image.mode not in ("RGBA", "LA", "P"):
+        return image.convert("RGB")
+    # Nền trong suốt -> trắng để JPEG/quantize không bị đen
+    background = Image.new("RGB", image.size, "white")
+    rgba = image.convert("RGBA")
+    background.paste(rgba, mask=rgba.getchannel("A"))
+    return background
+
+
+def encode_image(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        image.convert("RGB").save(buffer, "JPEG", quality=85, optimize=True)
+    else:
+        # Biểu đồ ít màu nên bảng màu 256 màu gần như không mất chi tiết
+        image.convert("RGB").quantize(colors=256).save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def encode_for_upload(image_bytes, max_pixels=None, fmt=None):
+    """Resize a chart to the pixel budget and re-encode it compactly.
+
+    Returns (payload bytes, MIME type). With fmt="auto" the smaller of
+    PNG and JPEG is used.
+    """
+    max_pixels = AI_IMAGE_MAX_PIXELS if max_pixels is None else max_pixels
+    fmt = fmt or AI_IMAGE_FORMAT
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.load()
+        image = fit_pixel_budget(flatten_alpha(image), max_pixels)
+        formats = ["png", "jpeg"] if fmt == "auto" else [fmt]
+        candidates = [(encode_image(image, f), f) for f in formats]
+    payload, chosen = min(candidates, key=lambda candidate: len(candidate[0]))
+    return payload, MIME_TYPES[chosen]
@@ -0,0 +1,149 @@
+import math
+
+# Nhận xét tự động bằng tiếng Việt từ số liệu sẵn có, dùng khi phân tích AI không kịp trả lời
+FALLBACK_NOTE = "(Nhận định tự động từ số liệu do phân tích AI không phản hồi kịp.)"
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def pct_change(new, old):
+    if not (is_number(new) and is_number(old)) or old == 0:
+        return None
+    return (new - old) / abs(old) * 100
+
+
+def trend(change, flat=1.0):
+    """'tăng 5.20%' / 'giảm 3.10%' / 'đi ngang' for a percentage change"""
+    if change is None:
+        return "không rõ biến động"
+    if abs(change) < flat:
+        return "đi ngang"
+    return f"{'tăng' if change > 0 else 'giảm'} {abs(change):,.2f}%"
+
+
+def year_values(ratios, column):
+    """(years, values) of one ratio column, skipping missing years"""
+    if ratios is None or column not in ratios:
+        return [], []
+    pairs = [(str(year), float(value)) for year, value in zip(ratios["Năm"], ratios[column])
+             if is_number(float(value))]
+    return [year for year, _ in pairs], [value for _, value in pairs]
+
+
+def assets_commentary(ratios):
+    years, assets = year_values(ratios, "Total Assets")
+    _, liabilities = year_values(ratios, "Total Liabilities")
+    _, debt_equity = year_values(ratios, "Total Debt/Equity")
+    if len(assets) < 2 or len(liabilities) != len(assets):
+        return None
+
+    sentences = [
+        f"Tổng tài sản năm {years[-1]} đạt {assets[-1]:,.0f} tỷ đồng, {trend(pct_change(assets[-1], assets[-2]))} "
+        f"so với năm {years[-2]} và {trend(pct_change(assets[-1], assets[0]))} so với năm {years[0]}.",
+        f"Tổng nợ phải trả ở mức {liabilities[-1]:,.0f} tỷ đồng, chiếm {liabilities[-1] / assets[-1] * 100:,.1f}% "
+        f"tổng tài sản ({trend(pct_change(liabilities[-1], liabilities[-2]))} so với năm trước).",
+    ]
+    if debt_equity:
+        level = "cao" if debt_equity[-1] > 200 else "vừa phải" if debt_equity[-1] > 100 else "thấp"
+        sentences.append(f"Tỷ lệ tổng nợ/vốn chủ sở hữu là {debt_equity[-1]:,.2f}%, đòn bẩy tài chính ở mức {level}.")
+    return " ".join(sentences)
+
+
+def profitability_commentary(ratios):
+    years, roe = year_values(ratios, "ROE")
+    _, roa = year_values(ratios, "ROA")
+    _, ros = year_values(ratios, "ROS")
+    if len(roe) < 2 or not roa or not ros:
+        return None
+
+    average_roe = sum(roe) / len(roe)
+    position = "cao hơn" if roe[-1] >= average_roe else "thấp hơn"
+    sentences = [
+        f"Năm {years[-1]}, ROE đạt {roe[-1]:,.2f}%, ROA {roa[-1]:,.2f}% và ROS {ros[-1]:,.2f}%.",
+        f"ROE thay đổi {roe[-1] - roe[-2]:+,.2f} điểm phần trăm so với năm {years[-2]} và {position} "
+        f"mức trung bình {len(roe)} năm ({average_roe:,.2f}%).",
+    ]
+    _, revenue = year_values(ratios, "Revenue")
+    _, net_income = year_values(ratios, "Net Income After Taxes")
+    if len(revenue) >= 2 and len(net_income) >= 2:
+        sentences.append(f"Doanh thu {trend(pct_change(revenue[-1], revenue[-2]))} trong khi lợi nhuận sau thuế "
+                         f"{trend(pct_change(net_income[-1], net_income[-2]))} so với năm trước.")
+    return " ".join(sentences)
+
+
+def trading_commentary(details):
+    if not details:
+        return None
+    periods = [("1 phiên", "Thay đổi 1 ngày"), ("5 phiên", "Thay đổi 5 ngày"), ("3 tháng", "Thay đổi 3 tháng"),
+               ("6 tháng", "Thay đổi 6 tháng "), ("từ đầu năm", "Thay đổi trong năm")]
+    changes = [(label, details.get(key)) for label, key in periods if is_number(details.get(key))]
+    if not changes:
+        return None
+
+    sentences = ["Biến động giá: " + ", ".join(f"{label} {value:+,.2f}%" for label, value in changes) + "."]
+    medium = [details.get("Thay đổi 3 tháng"), details.get("Thay đổi 6 tháng ")]
+    if all(is_number(value) for value in medium):
+        if all(value > 0 for value in medium):
+            sentences.append("Giá duy trì xu hướng tăng trong trung hạn.")
+        elif all(value < 0 for value in medium):
+            sentences.append("Giá đang trong xu hướng giảm trung hạn, cần thận trọng.")
+        else:
+            sentences.append("Xu hướng trung hạn chưa rõ ràng.")
+    if is_number(details.get("five_day_volume")):
+        sentences.append(f"Khối lượng khớp lệnh bình quân 5 phiên khoảng {details['five_day_volume']:,.0f} cổ phiếu.")
+    return " ".join(sentences)
+
+
+def structure_commentary(ratios):
+    years, assets = year_values(ratios, "Total Assets")
+    _, current_assets = year_values(ratios, "Total Current Assets")
+    _, fixed_assets = year_values(ratios, "Property/Plant/Equipment")
+    if not assets or len(current_assets) != len(assets) or assets[-1] == 0:
+        return None
+
+    current_share = current_assets[-1] / assets[-1] * 100
+    sentences = [f"Năm {years[-1]}, tài sản ngắn hạn chiếm {current_share:,.1f}% tổng tài sản."]
+    if len(fixed_assets) == len(assets):
+        sentences.append(f"Bất động sản, nhà xưởng và thiết bị chiếm {fixed_assets[-1] / assets[-1] * 100:,.1f}%.")
+    # Không nhận định theo ngành: báo cáo hàng loạt dùng chung hàm này cho mọi ngành
+    sentences.append("Cơ cấu nghiêng về tài sản ngắn hạn, cho thấy vốn chủ yếu nằm ở tài sản lưu động."
+                     if current_share >= 50 else "Tài sản dài hạn chiếm tỷ trọng lớn trong cơ cấu tài sản.")
+    return " ".join(sentences)
+
+
+def market_commentary(details, market_value=None):
+    sentences = []
+    if is_number(market_value):
+        sentences.append(f"Vốn hóa thị trường khoảng {market_value:,.0f} tỷ đồng.")
+    if details and is_number(details.get("Beta")):
+        beta = details["Beta"]
+        if beta > 1.1:
+            sentences.append(f"Beta {beta:,.2f} cho thấy cổ phiếu biến động mạnh hơn thị trường chung.")
+        elif beta < 0.9:
+            sentences.append(f"Beta {beta:,.2f} cho thấy cổ phiếu biến động ít hơn thị trường chung.")
+        else:
+            sentences.append(f"Beta {beta:,.2f} cho thấy cổ phiếu biến động tương đương thị trường chung.")
+    if details and is_number(details.get("Thay đổi trong năm")):
+        sentences.append(f"Từ đầu năm giá cổ phiếu {trend(details['Thay đổi trong năm'])}.")
+    return " ".join(sentences) or None
+
+
+def chart_commentary(kind, ratios=None, details=None, market_value=None):
+    """Vietnamese commentary for a report chart built only from numbers already loaded.
+
+    kind is one of 'assets', 'profitability', 'trading', 'structure', 'market'.
+    """
+    builders = {
+        "assets": lambda: assets_commentary(ratios),
+        "profitability": lambda: profitability_commentary(ratios),
+        "trading": lambda: trading_commentary(details),
+        "structure": lambda: structure_commentary(ratios),
+        "market": lambda: market_commentary(details, market_value),
+    }
+    try:
+        text = builders[kind]()
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        text = None
+    return f"{text or 'Chưa có đủ số liệu để nhận định biểu đồ này.'} {FALLBACK_NOTE}"
@@ -1,48 +1,73 @@
+import os
+import warnings
+from functools import lru_cache
+
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-# Đọc file Excel
-df_1 = pd.read_excel(r"data\2024-Vietnam.xlsx")
-xls = pd.ExcelFile(r"data\Vietnam_Marketcap.xlsx")
-df_1 = df_1[(df_1["Ngành ICB - cấp 1"] == "Dịch vụ Tiêu dùng") & (df_1["Ngành ICB - cấp 2"] == "Bán lẻ")]
-df_2 = pd.read_excel(xls, sheet_name='Sheet2')
+
+from cache_utils import cache_path, file_fingerprint
+from marketcap_store import get_marketcap_store
+from statement_loader import write_cache_file
+
+STATEMENT_FILE = r"data\2024-Vietnam.xlsx"
+MARKETCAP_FILE = r"data\Vietnam_Marketcap.xlsx"
 
 # Xác định khoảng thời gian cần lọc
 start_date = "2024-01-01"
 end_date = "2025-01-01"
 
-df_2["Ticker"] = df_2["Code"].str.extract(r"VT:([A-Z]+)\(")
-unique_tickers = df_1["Mã"]
-# Lọc các cổ phiếu thuộc ngành bán lẻ
-df_retail = df_2[df_2["Ticker"].isin(unique_tickers)]
-
-# Lọc dữ liệu theo khoảng thời gian
-df_retail = df_retail[["Name", "Code"] + [col for col in df_retail.columns if start_date <= str(col) <= end_date]]
+@lru_cache(maxsize=None)
+def read_icb_table(file_path=STATEMENT_FILE):
+    # Đọc file Excel một lần (chỉ các cột cần để lọc ngành) rồi cache Parquet như báo cáo tài chính,
+    # để các tiến trình con của batch_reports không phải đọc lại workbook
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    cache_file = cache_path("statements", f"{stem}.{file_fingerprint(file_path)}.icb.parquet")
+    if os.path.exists(cache_file):
+        return pd.read_parquet(cache_file)
+    df = pd.read_excel(file_path, usecols=["Mã", "Ngành ICB - cấp 1", "Ngành ICB - cấp 2"])
+    write_cache_file(df, cache_file)
+    return df
+
+@lru_cache(maxsize=None)
+def get_sector_companies(icb_level_1="Dịch vụ Tiêu dùng", icb_level_2="Bán lẻ", file_path=STATEMENT_FILE):
+    df_1 = read_icb_table(file_path)
+    return df_1[(df_1["Ngành ICB - cấp 1"] == icb_level_1) & (df_1["Ngành ICB - cấp 2"] == icb_level_2)]
+
+def get_ticker_sector(ticker, file_path=STATEMENT_FILE):
+    """(ICB level 1, ICB level 2) of a ticker, or None when it is not in the statement file"""
+    df_1 = read_icb_table(file_path)
+    rows = df_1[df_1["Mã"] == ticker]
+    if rows.empty:
+        return None
+    return rows.iloc[0]["Ngành ICB - cấp 1"], rows.iloc[0]["Ngành ICB - cấp 2"]
+
+@lru_cache(maxsize=None)
+def get_sector_marketcap(icb_level_1="Dịch vụ Tiêu dùng", icb_level_2="Bán lẻ", start_date=start_date, end_date=end_date):
+    store = get_marketcap_store(MARKETCAP_FILE, sheet_name="Sheet2")
+    unique_tickers = get_sector_companies(icb_level_1, icb_level_2)["Mã"]
+    # Chọn các dòng của ngành trước khi dựng bảng, để không chép cả ma trận vốn hóa (dùng chung qua memmap)
+    df_retail = store.to_frame(store.ticker_rows(unique_tickers))
+
+    # Lọc dữ liệu theo khoảng thời gian
+    return df_retail[["Name", "Code"] + [col for col in df_retail.columns if start_date <= str(col) <= end_date]]
+
+def __getattr__(name):
+    # Dữ liệu chỉ được đọc khi truy cập lần đầu, không đọc lúc import
+    if name == "df_1":
+        return get_sector_companies()
+    if name == "df_2":
+        return get_marketcap_store(MARKETCAP_FILE, sheet_name="Sheet2").to_frame()
+    if name == "df_retail":
+        return get_sector_marketcap()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_market_value(date_target="2024-12-31", row_label="MOBILE WORLD INVESTMENT - MARKET VALUE", date_row_index=None, file_path=MARKETCAP_FILE):
+    if date_row_index is not None:
+        # Store đọc ngày từ tiêu đề cột nên tham số này không còn tác dụng; giữ lại để không đổi vị trí file_path
+        warnings.warn("date_row_index không còn tác dụng và sẽ bị bỏ", DeprecationWarning, stacklevel=2)
+    # Tra cứu trong store đã đánh chỉ mục (chỉ đọc lại Excel khi file thay đổi)
+    store = get_marketcap_store(file_path, sheet_name="Sheet2")
+    market_value = store.get_value(row_label, date_target)
 
-import pandas as pd
-
-def get_market_value(date_target="2024-12-31", row_label="MOBILE WORLD INVESTMENT - MARKET VALUE", date_row_index=0):
-    # Đường dẫn đến file Excel
-    file_path = "data\\Vietnam_Marketcap.xlsx"
-    
-    # Đọc file Excel
-    df = pd.read_excel(file_path, sheet_name="Sheet2", header=None)
-
-    # Tìm cột ngày mục tiêu
-    try:
-        date_col_index = next(i for i, d in enumerate(df.iloc[date_row_index].astype(str)) if date_target in d)
-    except StopIteration:
-        raise ValueError(f"Không tìm thấy cột ngày {date_target} trong file Excel.")
-
-    # Tìm dòng chứa nhãn cần tìm
-    try:
-        row_index = df[df.iloc[:, 0].astype(str).str.strip().str.contains(row_label, case=False, na=False)].index[0]
-    except IndexError:
-        raise ValueError(f"Không tìm thấy dòng '{row_label}' trong file Excel. Kiểm tra lại tên!")
-
-    # Lấy giá trị tại ô tương ứng
-    market_value = df.iloc[row_index, date_col_index]
-    
     # Trả về giá trị đã chuyển sang ngàn VND
     return market_value / 1000
 
@@ -51,15 +76,14 @@ def get_market_value(date_target="2024-12-31", row_label="MOBILE WORLD INVESTMEN
 
 
 #Hàm vẽ bubble chart
-def plot_marketcap(df_retail, date_column_prefix="2024-12-31"):
-    # Cấu hình chung cho font chữ
-    plt.rcParams.update({
-        "font.family": "serif",
-        "font.size": 10,
-        "axes.labelweight": "bold",
-        "axes.titlesize": 15,
-        "axes.titleweight": "bold"
-    })
+def plot_marketcap(df_retail, date_column_prefix="2024-12-31", save_path=None, highlight="MWG", title=None,
+                   chart_service=None):
+    """Bubble chart of retail market caps; returns save_path, or the PNG bytes when no path is given.
+
+    With a chart_service the figure is drawn by its worker processes.
+    """
+    from chart_service import marketcap_chart
+    from render_cache import cached_render
 
     # Xử lí NaN
     df_retail_cleaned = df_retail.fillna(0)
@@ -80,34 +104,15 @@ def plot_marketcap(df_retail, date_column_prefix="2024-12-31"):
 
     # Lấy vốn hóa tại ngày 31/12/2024
     df_plot["marketcap_3112"] = df_plot[date_col]
-    
-    # Chia thành MWG và các mã khác
-    df_mwg = df_plot[df_plot["Ticker"] == "MWG"]
-    df_others = df_plot[df_plot["Ticker"] != "MWG"]
-
-    # Vẽ biểu đồ
-    plt.figure(figsize=(10, 6))
-
-    # Các cổ phiếu khác
-    plt.scatter(df_others["Ticker"], df_others["marketcap_3112"],
-                s=df_others["marketcap_3112"] / 1e3,  # scale size
-                c='skyblue', alpha=0.6, label='Khác')
-
-    # MWG nổi bật
-    plt.scatter(df_mwg["Ticker"], df_mwg["marketcap_3112"],
-                s=df_mwg["marketcap_3112"] / 1e3,
-                c='orange', alpha=0.9, label='MWG')
-
-    # Tiêu đề và nhãn
-    plt.title("Vốn hóa các cổ phiếu ngành Bán lẻ - 31/12/2024")
-    plt.ylabel("Vốn hóa (VNĐ)")
-    plt.xticks([])  # Không hiển thị nhãn trên trục X
-
-    # Sắp xếp lại bố cục để không bị cắt xén
-    plt.tight_layout()
-
-    # Hiển thị đồ thị
-    plt.show()
+
+    # Vẽ bằng Figure/Agg (không dùng trạng thái toàn cục của pyplot) nên có thể chạy trong tiến trình vẽ;
+    # dữ liệu không đổi thì lấy lại ảnh đã vẽ từ cache
+    options = {"title": title} if title else {}
+    if chart_service is not None:
+        return chart_service.render(marketcap_chart, df_plot[["Ticker", "marketcap_3112"]], highlight=highlight,
+                                    save_path=save_path, **options).result()
+    return cached_render(marketcap_chart, df_plot[["Ticker", "marketcap_3112"]], highlight=highlight,
+                         save_path=save_path, **options)
 
 # Sử dụng hàm
 #plot_marketcap(df_retail)
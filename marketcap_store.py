@@ -0,0 +1,172 @@
+import os
+import threading
+
+import pandas as pd
+
+from cache_utils import atomic_write, cache_path, file_fingerprint
+from shared_data import attach_frame, publish_frame
+
+MARKETCAP_FILE = "data\\Vietnam_Marketcap.xlsx"
+TICKER_PATTERN = r"VT:([A-Z]+)\("
+
+
+def normalize_name(name):
+    return str(name).strip().upper()
+
+
+def read_marketcap_sheet(file_path, sheet_name="Sheet2"):
+    """Read the market-cap sheet into a frame: Name, Code, then one column per date"""
+    df = pd.read_excel(file_path, sheet_name=sheet_name)
+    df = df.rename(columns={df.columns[0]: "Name"})
+    dates = pd.to_datetime(pd.Series(df.columns, dtype=object).astype(str), errors="coerce", format="mixed")
+    date_cols = {col: date.normalize() for col, date in zip(df.columns, dates)
+                 if pd.notna(date) and col not in ("Name", "Code")}
+
+    values = df[list(date_cols)].apply(pd.to_numeric, errors="coerce")
+    values.columns = pd.DatetimeIndex(list(date_cols.values()))
+    values.index = df["Name"].map(normalize_name)
+    values = values[~values.index.duplicated()]
+    values = values.loc[:, ~values.columns.duplicated()].sort_index(axis=1)
+
+    codes = df["Code"] if "Code" in df.columns else pd.Series(index=df.index, dtype=object)
+    info = pd.DataFrame({"Name": df["Name"].values, "Code": codes.values}, index=df["Name"].map(normalize_name))
+    return info[~info.index.duplicated()], values
+
+
+class MarketCapStore:
+    """Market-cap values indexed by series name (or ticker) and date"""
+
+    def __init__(self, info, values):
+        self.info = info
+        self.values = values
+        self.codes = info["Code"].astype(str).str.extract(TICKER_PATTERN)[0]
+        self.tickers = {ticker: name for name, ticker in self.codes.items() if pd.notna(ticker)}
+
+    def resolve(self, key):
+        """Map a ticker, an exact series name or a name fragment to the row key"""
+        name = normalize_name(key)
+        if name in self.values.index:
+            return name
+        if name in self.tickers:
+            return self.tickers[name]
+        # Giống cách cũ: tìm nhãn chứa chuỗi (không phân biệt hoa thường)
+        matches = self.values.index[self.values.index.str.contains(name, regex=False)]
+        if len(matches) == 0:
+            raise ValueError(f"Không tìm thấy dòng '{key}' trong file Excel. Kiểm tra lại tên!")
+        return matches[0]
+
+    def get_value(self, key, date):
+        name = self.resolve(key)
+        date = pd.Timestamp(date).normalize()
+        if date not in self.values.columns:
+            raise ValueError(f"Không tìm thấy cột ngày {date:%Y-%m-%d} trong file Excel.")
+        return self.values.at[name, date]
+
+    def get_range(self, key, start=None, end=None):
+        name = self.resolve(key)
+        return self.values.loc[name, start:end]
+
+    def ticker_rows(self, tickers):
+        """Row keys of every series whose code belongs to one of tickers, in store order"""
+        names = self.codes.index[self.codes.isin(set(tickers))]
+        return names[names.isin(self.values.index)]
+
+    def to_frame(self, names=None):
+        """Wide frame in the workbook layout: Name, Code and one column per date.
+
+        With names, only those rows are selected first, so a store attached
+        through a memory map copies just that slice instead of the whole matrix.
+        """
+        frame = self.values.copy() if names is None else self.values.loc[names]
+        frame.insert(0, "Code", self.info["Code"].reindex(frame.index).values)
+        frame.insert(0, "Name", self.info["Name"].reindex(frame.index).values)
+        return frame.reset_index(drop=True)
+
+    def save(self, path):
+        frame = self.values.copy()
+        frame.columns = frame.columns.strftime("%Y-%m-%d")
+        frame.insert(0, "Code", self.info["Code"].reindex(frame.index).astype(object).values)
+        frame.insert(0, "Name", self.info["Name"].reindex(frame.index).astype(object).values)
+        with atomic_write(path) as f:
+            frame.reset_index(names="Key").to_parquet(f, index=False)
+
+    @classmethod
+    def load(cls, path):
+        frame = pd.read_parquet(path).set_index("Key")
+        info = frame[["Name", "Code"]]
+        values = frame.drop(columns=["Name", "Code"])
+        values.columns = pd.DatetimeIndex(values.columns)
+        return cls(info, values)
+
+    def publish(self, name, folder=None):
+        """Publish the values matrix for worker processes to map read-only (see shared_data)"""
+        publish_frame(name, self.values, meta=self.info, folder=folder)
+
+    @classmethod
+    def attach(cls, name, folder=None):
+        shared = attach_frame(name, folder)
+        return None if shared is None else cls(shared[1], shared[0])
+
+    def merge(self, older):
+        """Keep history from an older store; values from this store win"""
+        values = self.values.combine_first(older.values).sort_index(axis=1)
+        info = self.info.combine_first(older.info)
+        return MarketCapStore(info, values)
+
+
+_stores = {}
+_lock = threading.Lock()
+# Tên bản dùng chung do tiến trình chính công bố: (đường dẫn, sheet) -> tên, để tiến trình con không phải hash lại workbook
+_published = {}
+
+
+def store_name(file_path, sheet_name):
+    """(stem, versioned name) of a workbook's store; the name changes whenever the workbook does"""
+    stem = f"{os.path.splitext(os.path.basename(file_path))[0]}-{sheet_name}"
+    return stem, f"{stem}.{file_fingerprint(file_path)}"
+
+
+def publish_marketcap_store(file_path=MARKETCAP_FILE, sheet_name="Sheet2", folder=None):
+    """Load the store once and publish it for worker processes to attach; returns the published names"""
+    name = store_name(file_path, sheet_name)[1]
+    get_marketcap_store(file_path, sheet_name).publish(name, folder)
+    return {(os.path.abspath(file_path), sheet_name): name}
+
+
+def use_published_stores(names):
+    """Pool initializer part: attach to the stores published by the parent under these names"""
+    _published.update(names or {})
+
+
+def get_marketcap_store(file_path=MARKETCAP_FILE, sheet_name="Sheet2"):
+    """Return the store for a workbook, rebuilding it only when the workbook changes"""
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), sheet_name)
+    with _lock:
+        cached = _stores.get(memo_key)
+        if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return cached[1]
+
+        # Báo cáo hàng loạt: gắn vào bản dùng chung do tiến trình chính công bố
+        store = MarketCapStore.attach(_published[memo_key]) if memo_key in _published else None
+        if store is not None:
+            _stores[memo_key] = ((stat.st_mtime_ns, stat.st_size), store)
+            return store
+
+        stem, name = store_name(file_path, sheet_name)
+        store_file = cache_path("marketcap", f"{name}.parquet")
+        if os.path.exists(store_file):
+            store = MarketCapStore.load(store_file)
+        else:
+            store = MarketCapStore(*read_marketcap_sheet(file_path, sheet_name))
+            # Workbook đổi: giữ lại lịch sử đã có, chỉ ghi đè/bổ sung phần mới
+            cache_dir = os.path.dirname(store_file)
+            for old_name in os.listdir(cache_dir):
+                old_file = os.path.join(cache_dir, old_name)
+                if old_name.split(".")[0] == stem and old_file != store_file and old_name.endswith(".parquet"):
+                    store = store.merge(MarketCapStore.load(old_file))
+                    os.remove(old_file)
+            store.save(store_file)
+
+        _stores[memo_key] = ((stat.st_mtime_ns, stat.st_size), store)
+        return store
@@ -0,0 +1,135 @@
+import contextlib
+import io
+import os
+import re
+import zlib
+from collections import defaultdict
+
+from PIL import Image
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from image_payload import flatten_alpha
+
+# Độ phân giải ảnh trong PDF (dpi theo kích thước đặt trên trang) và chất lượng JPEG
+PDF_IMAGE_DPI = float(os.getenv("PDF_IMAGE_DPI", "200"))
+PDF_JPEG_QUALITY = int(os.getenv("PDF_JPEG_QUALITY", "85"))
+# In bảng dung lượng từng đối tượng sau khi lưu PDF
+PDF_SIZE_REPORT = os.getenv("PDF_SIZE_REPORT", "1") == "1"
+
+# 14 font chuẩn của PDF không nhúng nên không cần subset
+STANDARD_FONTS = {name.encode() for name in (
+    "Courier", "Courier-Bold", "Courier-Oblique", "Courier-BoldOblique",
+    "Helvetica", "Helvetica-Bold", "Helvetica-Oblique", "Helvetica-BoldOblique",
+    "Times-Roman", "Times-Bold", "Times-Italic", "Times-BoldItalic", "Symbol", "ZapfDingbats")}
+STREAM_KINDS = ("content stream", "image", "font file")
+
+
+@contextlib.contextmanager
+def binary_streams():
+    """Switch off ReportLab's ASCII85 stream encoding inside the block, restoring the previous setting after"""
+    # ASCII85 làm mọi stream (ảnh, font) to thêm 25%; PDF nhị phân không cần mã hóa này.
+    # ReportLab đọc cờ toàn cục này cả lúc thêm ảnh lẫn lúc lưu, nên phải giữ suốt thời gian vẽ canvas
+    previous = rl_config.useA85
+    rl_config.useA85 = 0
+    try:
+        yield
+    finally:
+        rl_config.useA85 = previous
+
+
+def report_canvas(path, pagesize=A4):
+    """Canvas with compressed page streams; draw and save it inside binary_streams() for binary stream data"""
+    return canvas.Canvas(path, pagesize=pagesize, pageCompression=1)
+
+
+def placed_image(source, width, height, dpi=None, quality=None):
+    """ImageReader for source resampled to its placed size (points) at dpi, in the smaller encoding.
+
+    Images with at most 256 colours stay lossless (Flate). Others are sent as
+    JPEG or as a 256-colour Flate image, whichever is smaller.
+    """
+    dpi = dpi or PDF_IMAGE_DPI
+    quality = quality or PDF_JPEG_QUALITY
+    with Image.open(source) as image:
+        image.load()
+        image = flatten_alpha(image)
+
+    # Không phóng to ảnh nhỏ hơn kích thước cần
+    target = (max(1, round(width / 72 * dpi)), max(1, round(height / 72 * dpi)))
+    if target[0] < image.width and target[1] < image.height:
+        image = image.resize(target, Image.LANCZOS)
+
+    if image.getcolors(256) is not None:
+        return ImageReader(image)
+
+    jpeg = io.BytesIO()
+    image.save(jpeg, "JPEG", quality=quality, optimize=True)
+    # ReportLab nén ảnh không phải JPEG bằng Flate trên dữ liệu RGB thô
+    quantized = image.quantize(colors=256).convert("RGB")
+    if len(zlib.compress(quantized.tobytes())) < jpeg.tell():
+        return ImageReader(quantized)
+    jpeg.seek(0)
+    return ImageReader(jpeg)  # JPEG được nhúng nguyên (DCTDecode), không giải nén lại
+
+
+def draw_placed_image(c, source, x, y, width, height, dpi=None):
+    c.drawImage(placed_image(source, width, height, dpi), x, y, width=width, height=height)
+
+
+def object_kind(header):
+    """Category of a PDF object from its dictionary text"""
+    if b"/Subtype /Image" in header:
+        return "image"
+    if b"/Length1" in header:  # chương trình font TrueType nhúng (FontFile2)
+        return "font file"
+    if re.search(rb"/Type /(Font|FontDescriptor)\b", header):
+        return "font"
+    if re.search(rb"/Type /Pages?\b", header):
+        return "page"
+    if b"stream" in header:
+        return "content stream"
+    return "other"
+
+
+def pdf_objects(data):
+    """(number, kind, size, filters) of every indirect object in an uncompressed-xref PDF"""
+    objects = []
+    for match in re.finditer(rb"(\d+) \d+ obj\b(.*?)endobj", data, re.S):
+        body = match.group(2)
+        header = body.split(b"stream", 1)[0] + (b"stream" if b"stream" in body else b"")
+        filters = re.findall(rb"/(ASCII85Decode|FlateDecode|DCTDecode)", header)
+        objects.append((int(match.group(1)), object_kind(header), len(match.group(0)),
+                        [f.decode() for f in filters]))
+    return objects
+
+
+def pdf_size_report(path, top=5):
+    """Print the size of a PDF by object kind, its largest objects and font/compression checks"""
+    with open(path, "rb") as f:
+        data = f.read()
+    objects = pdf_objects(data)
+
+    totals = defaultdict(lambda: [0, 0])
+    for _, kind, size, _ in objects:
+        totals[kind][0] += 1
+        totals[kind][1] += size
+    print(f"Dung lượng {os.path.basename(path)}: {len(data) / 1024:,.1f} KB")
+    for kind, (n, size) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        print(f"  {kind:15s} {n:4d} đối tượng {size / 1024:10,.1f} KB")
+    overhead = len(data) - sum(size for _, _, size, _ in objects)
+    print(f"  {'xref/trailer':15s} {'':16s} {overhead / 1024:10,.1f} KB")
+    for number, kind, size, filters in sorted(objects, key=lambda o: -o[2])[:top]:
+        print(f"  #{number:<4d} {kind:15s} {size / 1024:10,.1f} KB {'/'.join(filters)}")
+
+    # Font TrueType nhúng đủ (không có tiền tố ABCDEF+) làm file to lên vài trăm KB
+    full_fonts = [name.decode() for name in re.findall(rb"/BaseFont /(\S+)", data)
+                  if not re.match(rb"[A-Z]{6}\+", name) and name not in STANDARD_FONTS]
+    if full_fonts:
+        print(f"  Cảnh báo: font không được subset: {', '.join(sorted(set(full_fonts)))}")
+    raw_streams = sum(1 for _, kind, _, filters in objects if kind in STREAM_KINDS and not filters)
+    if raw_streams:
+        print(f"  Cảnh báo: {raw_streams} stream không được nén")
+    return objects
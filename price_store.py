@@ -0,0 +1,215 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import pandas as pd
+from vnstock import Quote
+
+from cache_utils import cache_path
+
+PRICE_COLUMNS = ["open", "high", "low", "close", "volume"]
+SOURCE = "VCI"
+
+_init_lock = threading.Lock()
+_initialized = set()
+
+
+def get_db_path():
+    return cache_path("prices.sqlite")
+
+
+def connect():
+    db_path = get_db_path()
+    conn = sqlite3.connect(db_path, timeout=30)
+    with _init_lock:
+        if db_path not in _initialized:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS bars (
+                    symbol TEXT, interval TEXT, time TEXT,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (symbol, interval, time)
+                );
+                CREATE TABLE IF NOT EXISTS coverage (
+                    symbol TEXT, interval TEXT, start TEXT, end TEXT,
+                    PRIMARY KEY (symbol, interval)
+                );
+                -- Nhiều khoảng rời nhau cho mỗi mã; khoảng trống giữa chúng chưa được tải
+                CREATE TABLE IF NOT EXISTS coverage_ranges (
+                    symbol TEXT, interval TEXT, start TEXT, end TEXT,
+                    PRIMARY KEY (symbol, interval, start)
+                );
+                -- Chuyển vùng phủ của bảng cũ (một khoảng mỗi mã) sang bảng mới
+                INSERT OR IGNORE INTO coverage_ranges SELECT symbol, interval, start, end FROM coverage;
+                DELETE FROM coverage;
+            """)
+            _initialized.add(db_path)
+    return conn
+
+
+def fetch_history(symbol, start_date, end_date, interval="1D"):
+    """Fetch bars from Vnstock (Quote avoids the company lookup done by Vnstock().stock)"""
+    df = Quote(symbol=symbol, source=SOURCE).history(start=start_date, end=end_date, interval=interval)
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["time"] + PRICE_COLUMNS)
+    df = df.copy()
+    df["time"] = pd.to_datetime(df["time"])
+    return df
+
+
+def get_coverage(conn, symbol, interval):
+    """Covered (start, end) date ranges of symbol, sorted and non-overlapping"""
+    rows = conn.execute("SELECT start, end FROM coverage_ranges WHERE symbol = ? AND interval = ? ORDER BY start",
+                        (symbol, interval)).fetchall()
+    return [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in rows]
+
+
+def missing_ranges(coverage, start, end):
+    """Date ranges to fetch so the store covers [start, end]: the gaps between covered ranges"""
+    ranges = []
+    cursor = start
+    for covered_start, covered_end in coverage or []:
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            ranges.append((cursor, covered_start - pd.Timedelta(days=1)))
+        cursor = covered_end + pd.Timedelta(days=1)
+    if cursor <= end:
+        ranges.append((cursor, end))
+    return ranges
+
+
+def save_bars(conn, symbol, interval, df):
+    times = pd.to_datetime(df["time"]).dt.strftime("%Y-%m-%d %H:%M:%S")
+    values = df[PRICE_COLUMNS].astype(float)
+    values = values.astype(object).where(values.notna(), None)
+    rows = [(symbol, interval, time, *bar) for time, bar in zip(times, values.itertuples(index=False))]
+    conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def extend_coverage(conn, symbol, interval, start, end):
+    """Record [start, end] as covered, merging only with ranges it overlaps or touches"""
+    one_day = pd.Timedelta(days=1)
+    for covered_start, covered_end in get_coverage(conn, symbol, interval):
+        if covered_start <= end + one_day and covered_end >= start - one_day:
+            start, end = min(start, covered_start), max(end, covered_end)
+            conn.execute("DELETE FROM coverage_ranges WHERE symbol = ? AND interval = ? AND start = ?",
+                         (symbol, interval, covered_start.strftime("%Y-%m-%d")))
+    conn.execute("INSERT OR REPLACE INTO coverage_ranges VALUES (?, ?, ?, ?)",
+                 (symbol, interval, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")))
+
+
+def read_bars(conn, symbol, interval, start, end):
+    df = pd.read_sql_query(
+        "SELECT time, open, high, low, close, volume FROM bars "
+        "WHERE symbol = ? AND interval = ? AND time >= ? AND time < ? ORDER BY time",
+        conn,
+        params=(symbol, interval, start.strftime("%Y-%m-%d"),
+                (end + pd.Timedelta(days=1)).strftime("%Y-%m-%d")),
+    )
+    df["time"] = pd.to_datetime(df["time"])
+    return df
+
+
+class FetchBatch:
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.done = threading.Event()
+        self.error = None
+
+
+class RangeCoalescer:
+    """Single-flight fetcher that merges overlapping requests per (symbol, interval).
+
+    Requests that arrive while a batch is still gathering widen it to the union
+    range; requests already covered by a running batch just wait for it. Either
+    way the network sees one call for the whole union.
+    """
+
+    def __init__(self, fetch, window=0.05):
+        self.fetch = fetch
+        self.window = window
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.running = {}
+
+    def request(self, symbol, start, end, interval="1D"):
+        key = (symbol, interval)
+        leader = False
+        with self.lock:
+            batch = next((b for b in self.running.get(key, []) if b.start <= start and end <= b.end), None)
+            if batch is None:
+                batch = self.pending.get(key)
+                if batch is None:
+                    batch = self.pending[key] = FetchBatch(start, end)
+                    leader = True
+                else:
+                    batch.start, batch.end = min(batch.start, start), max(batch.end, end)
+
+        if leader:
+            # Chờ một khoảng ngắn để gom các yêu cầu trùng/chồng lấn
+            time.sleep(self.window)
+            with self.lock:
+                del self.pending[key]
+                self.running.setdefault(key, []).append(batch)
+            try:
+                self.fetch(symbol, batch.start, batch.end, interval)
+            except Exception as e:
+                batch.error = e
+            finally:
+                with self.lock:
+                    self.running[key].remove(batch)
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+
+
+def fetch_and_store(symbol, start, end, interval="1D"):
+    """Fetch [start, end] from the network and record it in the store"""
+    df = fetch_history(symbol, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), interval)
+    if df.empty:
+        # Phản hồi rỗng (có thể do lỗi im lặng) không được đánh dấu là đã có, lần sau tải lại
+        return
+    # Chỉ đánh dấu đến nến cuối thực sự nhận được; nến của hôm nay có thể chưa chốt nên cũng không tính
+    last_bar_day = pd.to_datetime(df["time"]).max().normalize()
+    last_closed_day = pd.Timestamp.today().normalize() - pd.Timedelta(days=1)
+    covered_end = min(end, last_bar_day, last_closed_day)
+    with closing(connect()) as conn, conn:
+        save_bars(conn, symbol, interval, df)
+        if start <= covered_end:
+            extend_coverage(conn, symbol, interval, start, covered_end)
+
+
+_coalescer = RangeCoalescer(fetch_and_store, window=float(os.getenv("PRICE_COALESCE_WINDOW", "0.05")))
+
+
+def get_price_history(symbol, start_date, end_date, interval="1D"):
+    """Daily bars for symbol in [start_date, end_date], fetching only what the store lacks"""
+    symbol = symbol.upper()
+    start = pd.Timestamp(start_date).normalize()
+    end = pd.Timestamp(end_date).normalize()
+
+    with closing(connect()) as conn:
+        coverage = get_coverage(conn, symbol, interval)
+    for fetch_start, fetch_end in missing_ranges(coverage, start, end):
+        try:
+            _coalescer.request(symbol, fetch_start, fetch_end, interval)
+        except Exception as e:
+            print(f"Không lấy được dữ liệu {symbol} {fetch_start:%Y-%m-%d}..{fetch_end:%Y-%m-%d}: {e}")
+
+    with closing(connect()) as conn:
+        return read_bars(conn, symbol, interval, start, end)
+
+
+def prefetch_history(symbol, ranges, interval="1D"):
+    """Load the union of several (start, end) windows with a single fetch"""
+    start = min(pd.Timestamp(s) for s, _ in ranges)
+    end = max(pd.Timestamp(e) for _, e in ranges)
+    get_price_history(symbol, start, end, interval)
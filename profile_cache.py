@@ -0,0 +1,93 @@
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import re
+import threading
+import time
+
+from cache_utils import atomic_write, cache_path
+
+# Thời gian sống của hồ sơ công ty (giây), mặc định 1 ngày
+PROFILE_TTL = float(os.getenv("PROFILE_CACHE_TTL", 24 * 3600))
+
+_memory = {}
+_locks = {}
+_lock = threading.Lock()
+
+
+def profile_file(source, key):
+    safe_key = re.sub(r"[^A-Za-z0-9_.-]", "_", key)
+    return cache_path("profiles", source, f"{safe_key}.pkl")
+
+
+def read_profile(path, ttl):
+    try:
+        with open(path, "rb") as f:
+            stored_at, value = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, ValueError):
+        return None
+    return (stored_at, value) if time.time() - stored_at < ttl else None
+
+
+def write_profile(path, entry):
+    try:
+        with atomic_write(path) as f:
+            pickle.dump(entry, f)
+    except OSError as e:
+        print(f"Không lưu được cache hồ sơ {os.path.basename(path)}: {e}")
+
+
+def cached_profile(source, key, fetch, ttl=None):
+    """Return fetch() for (source, key), reusing a result younger than ttl.
+
+    Results are kept in memory and on disk; a None result (failed lookup)
+    is returned but not cached.
+    """
+    ttl = PROFILE_TTL if ttl is None else ttl
+    memo_key = (source, key)
+    with _lock:
+        key_lock = _locks.setdefault(memo_key, threading.Lock())
+
+    # Mỗi khóa chỉ tải một lần kể cả khi nhiều luồng gọi cùng lúc
+    with key_lock:
+        entry = _memory.get(memo_key)
+        if entry and time.time() - entry[0] < ttl:
+            return entry[1]
+
+        path = profile_file(source, key)
+        entry = read_profile(path, ttl)
+        if entry is None:
+            value = fetch()
+            if value is None:
+                return None
+            entry = (time.time(), value)
+            write_profile(path, entry)
+        _memory[memo_key] = entry
+        return entry[1]
+
+
+def profile_cache(source):
+    """Decorator memoising a lookup func(ticker, ...) per (source, ticker and any non-default arguments)"""
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(ticker, *args, **kwargs):
+            key = str(ticker).upper()
+            # Tham số khác mặc định (vd. url riêng) cho kết quả khác nên phải nằm trong khóa
+            bound = signature.bind(ticker, *args, **kwargs)
+            extras = sorted((name, repr(value)) for name, value in list(bound.arguments.items())[1:]
+                            if value != signature.parameters[name].default)
+            if extras:
+                key += "-" + hashlib.sha256(repr(extras).encode("utf-8")).hexdigest()[:12]
+            return cached_profile(source, key, lambda: func(ticker, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def clear_profile_cache():
+    """Forget in-process entries (disk entries expire by TTL)"""
+    with _lock:
+        _memory.clear()
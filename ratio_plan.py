@@ -0,0 +1,91 @@
+import ast
+from collections import namedtuple
+
+import numpy as np
+
+# steps: các bước theo thứ tự phụ thuộc, outputs: tên chỉ tiêu -> vị trí kết quả
+RatioPlan = namedtuple("RatioPlan", ["steps", "outputs"])
+
+def safe_divide(numerator, denominator):
+    """Divide element-wise, returning 0 where the denominator is 0"""
+    numerator, denominator = np.broadcast_arrays(np.asarray(numerator, dtype=float),
+                                                 np.asarray(denominator, dtype=float))
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator != 0)
+
+BINARY_OPS = {
+    ast.Add: ("add", np.add),
+    ast.Sub: ("sub", np.subtract),
+    ast.Mult: ("mul", np.multiply),
+    ast.Div: ("div", safe_divide),
+}
+OPS = {name: func for name, func in BINARY_OPS.values()}
+
+def compile_ratio_plan(definitions, labels, intermediates=None):
+    """Compile ratio expressions into a dependency-ordered plan.
+
+    Names in an expression refer to a key of labels (sum of its line items)
+    or of intermediates. Identical sub-expressions share one step, so each
+    label and each intermediate is computed once however many ratios use it.
+    """
+    intermediates = intermediates or {}
+    steps = []
+    memo = {}
+    resolved = {}
+    resolving = set()
+
+    def add_step(key):
+        if key not in memo:
+            memo[key] = len(steps)
+            steps.append(key)
+        return ("slot", memo[key])
+
+    def compile_name(name):
+        if name in resolved:
+            return resolved[name]
+        if name in intermediates:
+            if name in resolving:
+                raise ValueError(f"Định nghĩa '{name}' bị phụ thuộc vòng.")
+            resolving.add(name)
+            resolved[name] = compile_expression(intermediates[name])
+            resolving.discard(name)
+        elif name in labels:
+            resolved[name] = add_step(("labels", tuple(labels[name])))
+        else:
+            raise ValueError(f"Không tìm thấy chỉ tiêu '{name}' trong labels.")
+        return resolved[name]
+
+    def compile_node(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return ("const", float(node.value))
+        if isinstance(node, ast.Name):
+            return compile_name(node.id)
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+            op_name = BINARY_OPS[type(node.op)][0]
+            return add_step((op_name, compile_node(node.left), compile_node(node.right)))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return add_step(("mul", ("const", -1.0), compile_node(node.operand)))
+        raise ValueError(f"Biểu thức không hỗ trợ: {ast.unparse(node)}")
+
+    def compile_expression(expression):
+        return compile_node(ast.parse(expression, mode="eval").body)
+
+    outputs = {name: compile_expression(expression) for name, expression in definitions.items()}
+    return RatioPlan(steps, outputs)
+
+def evaluate_ratio_plan(plan, get_values, size):
+    """Run a compiled plan; get_values maps a line-item label to an array"""
+    results = []
+
+    def value_of(arg):
+        kind, value = arg
+        return results[value] if kind == "slot" else value
+
+    for step in plan.steps:
+        if step[0] == "labels":
+            results.append(sum((get_values(label) for label in step[1]), np.zeros(size)))
+        else:
+            op_name, left, right = step
+            results.append(OPS[op_name](value_of(left), value_of(right)))
+
+    return {name: np.broadcast_to(value_of(arg), (size,)).astype(float)
+            for name, arg in plan.outputs.items()}
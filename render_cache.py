@@ -0,0 +1,141 @@
+import hashlib
+import inspect
+import os
+import threading
+import types
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+from cache_utils import CACHE_DIR, atomic_write, cache_path
+
+# Dung lượng tối đa của cache ảnh biểu đồ trên đĩa (MB); vượt quá thì xóa ảnh lâu không dùng nhất
+RENDER_CACHE_MAX_MB = float(os.getenv("RENDER_CACHE_MAX_MB", "200"))
+RENDER_CACHE_DIR = os.path.join(CACHE_DIR, "charts")
+
+stats = {"hits": 0, "misses": 0, "evictions": 0}
+_lock = threading.Lock()
+
+
+def count(name, n=1):
+    with _lock:
+        stats[name] += n
+
+
+def render_stats():
+    with _lock:
+        return dict(stats)
+
+
+def value_bytes(value):
+    """Stable byte form of one renderer argument (data frames are hashed by content)"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        hashed = pd.util.hash_pandas_object(value, index=True).to_numpy()
+        columns = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+        layout = repr((columns, [str(t) for t in np.atleast_1d(value.dtypes)]))
+        return layout.encode("utf-8") + hashed.tobytes()
+    if isinstance(value, np.ndarray):
+        return repr((value.dtype.str, value.shape)).encode("utf-8") + np.ascontiguousarray(value).tobytes()
+    return repr(value).encode("utf-8")
+
+
+def code_fingerprint(code):
+    """Bytecode and constants of a renderer, so editing the chart code invalidates its images"""
+    parts = [code.co_code]
+    for const in code.co_consts:
+        # Hàm lồng (lambda) có repr chứa địa chỉ bộ nhớ nên băm đệ quy phần mã của nó
+        parts.append(code_fingerprint(const) if isinstance(const, types.CodeType) else repr(const).encode("utf-8"))
+    return b"".join(parts)
+
+
+def render_key(func, args, kwargs):
+    """Content address of a chart: renderer code, plotted data and every parameter except save_path"""
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    bound.arguments.pop("save_path", None)
+
+    digest = hashlib.sha256()
+    parts = [f"{func.__module__}.{func.__qualname__}".encode("utf-8"), matplotlib.__version__.encode("utf-8"),
+             code_fingerprint(func.__code__)]
+    for name, value in bound.arguments.items():
+        parts += [name.encode("utf-8"), value_bytes(value)]
+    for part in parts:
+        # Ghi độ dài trước mỗi phần để các cách ghép khác nhau không trùng khóa
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def chart_file(key):
+    return cache_path("charts", key[:2], f"{key}.png")
+
+
+def load_chart(key):
+    """Cached PNG bytes for key, or None; a hit refreshes the file's mtime for LRU eviction"""
+    path = chart_file(key)
+    try:
+        with open(path, "rb") as f:
+            image = f.read()
+        os.utime(path)
+    except OSError:
+        return None
+    return image
+
+
+def store_chart(key, image):
+    try:
+        with atomic_write(chart_file(key)) as f:
+            f.write(image)
+    except OSError as e:
+        print(f"Không lưu được cache biểu đồ {key[:12]}: {e}")
+        return
+    evict()
+
+
+def evict(max_bytes=None):
+    """Delete least recently used images until the cache fits in max_bytes"""
+    max_bytes = RENDER_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+    entries = []
+    for folder, _, files in os.walk(RENDER_CACHE_DIR):
+        for name in files:
+            if name.endswith(".png"):
+                path = os.path.join(folder, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        count("evictions")
+
+
+def deliver(image, save_path=None):
+    """Write image to save_path and return the path, or return the bytes when no path is given"""
+    if not save_path:
+        return image
+    with open(save_path, "wb") as f:
+        f.write(image)
+    return save_path
+
+
+def cached_render(func, *args, save_path=None, **kwargs):
+    """Call a chart renderer (returning PNG bytes when save_path is None) through the cache"""
+    key = render_key(func, args, kwargs)
+    image = load_chart(key)
+    if image is not None:
+        count("hits")
+        return deliver(image, save_path)
+    count("misses")
+    image = func(*args, save_path=None, **kwargs)
+    store_chart(key, image)
+    return deliver(image, save_path)
@@ -0,0 +1,68 @@
+import contextlib
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from cache_utils import cache_path
+
+# Thư mục chứa dữ liệu dùng chung của lần chạy hiện tại; tiến trình con đọc biến này để gắn vào
+SHARED_DATA_ENV = "REPORT_SHARED_DATA"
+
+
+def shared_folder_path():
+    return os.environ.get(SHARED_DATA_ENV)
+
+
+def use_shared_folder(folder):
+    """Pool initializer: attach this worker to the parent's shared datasets"""
+    if folder:
+        os.environ[SHARED_DATA_ENV] = folder
+
+
+def publish_frame(name, frame, meta=None, folder=None):
+    """Write a numeric frame as a raw NumPy array plus a small pickled index for attach_frame"""
+    folder = folder or shared_folder_path()
+    values = np.ascontiguousarray(frame.to_numpy(dtype=np.float64))
+    np.save(os.path.join(folder, f"{name}.npy"), values)
+    with open(os.path.join(folder, f"{name}.index.pkl"), "wb") as f:
+        pickle.dump({"index": frame.index, "columns": frame.columns, "meta": meta}, f)
+
+
+def attach_frame(name, folder=None):
+    """(frame, meta) backed by a read-only memory map of a published array, or None if not published.
+
+    Every process mapping the same file shares its pages through the OS
+    page cache; nothing is copied into the process until it is modified,
+    and the frame itself refuses writes.
+    """
+    folder = folder or shared_folder_path()
+    if not folder:
+        return None
+    try:
+        with open(os.path.join(folder, f"{name}.index.pkl"), "rb") as f:
+            layout = pickle.load(f)
+        values = np.load(os.path.join(folder, f"{name}.npy"), mmap_mode="r")
+    except OSError:
+        return None
+    frame = pd.DataFrame(values, index=layout["index"], columns=layout["columns"], copy=False)
+    return frame, layout["meta"]
+
+
+@contextlib.contextmanager
+def shared_folder():
+    """Create a folder for this run's shared datasets and point child processes at it"""
+    folder = tempfile.mkdtemp(prefix=f"{os.getpid()}-", dir=os.path.dirname(cache_path("shared", "x")))
+    previous = os.environ.get(SHARED_DATA_ENV)
+    os.environ[SHARED_DATA_ENV] = folder
+    try:
+        yield folder
+    finally:
+        if previous is None:
+            os.environ.pop(SHARED_DATA_ENV, None)
+        else:
+            os.environ[SHARED_DATA_ENV] = previous
+        shutil.rmtree(folder, ignore_errors=True)
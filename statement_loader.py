@@ -0,0 +1,158 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from cache_utils import atomic_write, cache_path, file_fingerprint
+
+def convert_units(df, factor, start_col):
+    start_idx = df.columns.get_loc(start_col) + 1
+    numeric_cols = df.columns[start_idx:]
+    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce') / factor
+    return df
+
+def clean_column_names(columns, year):
+    columns = columns.str.replace(f"Năm: {year}", "", regex=True)
+    columns = columns.str.replace(r"Đơn vị: (Tỷ|Triệu) VND", "", regex=True)
+    columns = columns.str.replace(r"\bHợp nhất\b|\bQuý: Hàng năm\b", "", regex=True)
+    return columns.str.strip()
+
+def clean_columns(df, year):
+    df.columns = clean_column_names(df.columns, year)
+    df.drop(columns=[col for col in df.columns if "TM" in col], inplace=True)
+    return df
+
+def read_year_data(file_path, year, start_column, factor=1e9, columns=None):
+    if columns is not None:
+        return read_year_projected(file_path, year, columns, factor)
+    df = pd.read_excel(file_path, engine="openpyxl")
+    df = clean_columns(df, year)
+    if year < 2023:  # Chỉ chuyển đơn vị từ 2020 đến 2022
+        df = convert_units(df, factor, start_column)
+    return df
+
+def needed_columns(labels, extra=("MÃ",)):
+    """Standardized column names used by a labels map, plus the ticker column"""
+    return set(extra) | {label for label_list in labels.values() for label in label_list}
+
+def read_year_projected(file_path, year, columns, factor=1e9):
+    """Stream only the requested columns of a yearly workbook"""
+    import openpyxl  # chỉ cần khi thật sự đọc Excel
+
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = pd.Index(["" if h is None else str(h) for h in next(rows)])
+        names = clean_column_names(header, year)
+        # Chuẩn hóa giống standardize_columns để so khớp với labels
+        keys = names.str.replace("\n", " ").str.upper()
+
+        keep = []
+        for i, (name, key) in enumerate(zip(names, keys)):
+            if key in columns and "TM" not in name and name not in names[keep]:
+                keep.append(i)
+        data = [[row[i] for i in keep] for row in rows]
+        data = [values for values in data if any(v is not None for v in values)]
+    finally:
+        wb.close()
+
+    df = pd.DataFrame(data, columns=names[keep])
+    value_cols = [col for col in df.columns if col.upper() != "MÃ"]
+    df[value_cols] = df[value_cols].apply(pd.to_numeric, errors='coerce')
+    if year < 2023:  # Chỉ chuyển đơn vị từ 2020 đến 2022
+        df[value_cols] = df[value_cols] / factor
+    return df
+
+def compare_projected_read(file_path, year, columns, start_column, factor=1e9):
+    """Report parse time and memory of a projected read against a full read"""
+    t0 = time.perf_counter()
+    full_df = read_year_data(file_path, year, start_column, factor)
+    t1 = time.perf_counter()
+    projected_df = read_year_projected(file_path, year, columns, factor)
+    t2 = time.perf_counter()
+
+    report = {
+        "file": file_path,
+        "full_seconds": t1 - t0,
+        "projected_seconds": t2 - t1,
+        "full_columns": full_df.shape[1],
+        "projected_columns": projected_df.shape[1],
+        "full_bytes": int(full_df.memory_usage(deep=True).sum()),
+        "projected_bytes": int(projected_df.memory_usage(deep=True).sum()),
+    }
+    print(f"{file_path}: {report['full_seconds']:.2f}s -> {report['projected_seconds']:.2f}s, "
+          f"{report['full_bytes'] / 1e6:.1f} MB -> {report['projected_bytes'] / 1e6:.1f} MB "
+          f"({report['full_columns']} -> {report['projected_columns']} cột)")
+    return report
+
+def get_cache_file(file_path, factor, columns=None):
+    # Khóa cache gồm đường dẫn, mtime, hash nội dung file, hệ số quy đổi và tập cột
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    name = f"{stem}.{file_fingerprint(file_path)}.{factor:g}"
+    if columns is not None:
+        name += "." + hashlib.sha256("|".join(sorted(columns)).encode("utf-8")).hexdigest()[:12]
+    return cache_path("statements", f"{name}.parquet")
+
+def write_cache_file(df, cache_file):
+    # Xóa các bản cache cũ (khác fingerprint) của cùng workbook trước khi ghi bản mới
+    cache_dir = os.path.dirname(cache_file)
+    stem, fingerprint = os.path.basename(cache_file).split(".")[:2]
+    for name in os.listdir(cache_dir):
+        parts = name.split(".")
+        if parts[0] == stem and parts[1] != fingerprint and name.endswith(".parquet"):
+            os.remove(os.path.join(cache_dir, name))
+    with atomic_write(cache_file) as f:
+        df.to_parquet(f, index=False)
+
+def resolve_workers(workers, n_jobs):
+    # Tiến trình con không tự tạo pool mới; mặc định dùng số nhân CPU
+    if multiprocessing.parent_process() is not None:
+        return 1
+    if workers is None:
+        workers = int(os.getenv("LOAD_WORKERS", os.cpu_count() or 1))
+    return max(1, min(workers, n_jobs))
+
+def pool_context():
+    # fork từ tiến trình đang có nhiều luồng dễ bị treo (khóa đang bị giữ), nên dùng forkserver/spawn
+    if threading.active_count() > 1:
+        methods = multiprocessing.get_all_start_methods()
+        return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return None
+
+def read_years(jobs, start_column, factor=1e9, workers=None, columns=None):
+    """Parse (file_path, year) jobs, in a process pool when workers > 1"""
+    workers = resolve_workers(workers, len(jobs))
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+                futures = [pool.submit(read_year_data, file_path, year, start_column, factor, columns)
+                           for file_path, year in jobs]
+                return [future.result() for future in futures]
+        except (OSError, BrokenProcessPool) as e:
+            print(f"Không chạy được song song ({e}), chuyển sang đọc tuần tự")
+    return [read_year_data(file_path, year, start_column, factor, columns) for file_path, year in jobs]
+
+def load_all_data(file_paths, start_column, factor=1e9, use_cache=True, workers=None, columns=None):
+    # columns: tập tên cột đã chuẩn hóa (xem needed_columns), None để đọc toàn bộ
+    dfs = [None] * len(file_paths)
+    missing = []
+    for i, file_path in enumerate(file_paths):
+        cache_file = get_cache_file(file_path, factor, columns) if use_cache else None
+        if cache_file and os.path.exists(cache_file):
+            # Cache còn hợp lệ: đọc file Parquet, không cần openpyxl
+            dfs[i] = pd.read_parquet(cache_file)
+        else:
+            missing.append((i, cache_file))
+
+    # Các năm chưa có cache được đọc song song, kết quả giữ đúng thứ tự năm
+    jobs = [(file_paths[i], 2020 + i) for i, _ in missing]
+    for (i, cache_file), df in zip(missing, read_years(jobs, start_column, factor, workers, columns)):
+        if cache_file:
+            write_cache_file(df, cache_file)
+        dfs[i] = df
+    return dfs
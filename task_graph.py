@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+
+
+class TaskGraph:
+    """Run named tasks on a bounded thread pool as soon as their dependencies finish.
+
+    A task receives the results of its dependencies as positional arguments.
+    Dependencies must be added before the tasks that use them, so the graph
+    cannot contain cycles. A failed dependency fails every task after it.
+    Tasks whose dependencies finish after the graph is shut down are
+    cancelled instead of started.
+    """
+
+    def __init__(self, max_workers=None):
+        max_workers = max_workers or int(os.getenv("REPORT_WORKERS", "16"))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report")
+        self.futures = {}
+        self.timings = {}
+        self.lock = threading.Lock()
+        self._closed = False
+
+    def add(self, name, func, deps=()):
+        if name in self.futures:
+            raise ValueError(f"Tác vụ '{name}' đã tồn tại.")
+        missing = [dep for dep in deps if dep not in self.futures]
+        if missing:
+            raise ValueError(f"Tác vụ '{name}' phụ thuộc tác vụ chưa khai báo: {missing}")
+
+        future = Future()
+        self.futures[name] = future
+        dep_futures = [self.futures[dep] for dep in deps]
+        remaining = [len(dep_futures)]
+
+        def run(*args):
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self.timings[name] = time.perf_counter() - started
+
+        def forward(inner):
+            if inner.cancelled():
+                future.set_exception(CancelledError())
+            elif inner.exception() is not None:
+                future.set_exception(inner.exception())
+            else:
+                future.set_result(inner.result())
+
+        def start():
+            failed = next((f for f in dep_futures if f.exception() is not None), None)
+            if failed is not None:
+                future.set_exception(failed.exception())
+                return
+            # Kiểm tra và submit cùng trong khóa để shutdown không chen vào giữa
+            inner = None
+            with self.lock:
+                if not self._closed:
+                    inner = self.executor.submit(run, *[f.result() for f in dep_futures])
+            if inner is None:
+                future.set_exception(CancelledError())
+                return
+            inner.add_done_callback(forward)
+
+        def on_dependency_done(_):
+            with self.lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                start()
+
+        if not dep_futures:
+            start()
+        for dep_future in dep_futures:
+            dep_future.add_done_callback(on_dependency_done)
+        return future
+
+    def result(self, name, timeout=None):
+        """Wait for a task and return its result (re-raising its error)"""
+        return self.futures[name].result(timeout)
+
+    def shutdown(self):
+        """Stop starting tasks, cancel queued ones and wait for the running ones"""
+        with self.lock:
+            self._closed = True
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
@@ -1,14 +1,25 @@
+import hashlib
+import os
+import pickle
 import requests
 import ssl
+import threading
+import warnings
 import urllib3  
 from urllib3.util.ssl_ import create_urllib3_context
 from urllib3.poolmanager import PoolManager
 from requests.adapters import HTTPAdapter
-from bs4 import BeautifulSoup
+from urllib3.util.retry import Retry
 from vnstock import *
 import webbrowser
 import pandas as pd
 
+from cache_utils import atomic_write, cache_path
+from html_extract import extract_intro, extract_profile
+from marketcap_store import get_marketcap_store
+from price_store import get_price_history
+from profile_cache import profile_cache
+
 class CustomHttpAdapter (requests.adapters.HTTPAdapter):
     def __init__(self, ssl_context=None, **kwargs):
         self.ssl_context = ssl_context
@@ -20,21 +31,85 @@ class CustomHttpAdapter (requests.adapters.HTTPAdapter):
             block=block, ssl_context=self.ssl_context)
 
 
+# Cấu hình kết nối HTTP dùng chung (có thể đổi qua biến môi trường)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+_sessions = {}
+_session_lock = threading.Lock()
+
+
+def get_session(legacy_tls=False, pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE):
+    """Process-wide pooled session (keep-alive, retry with backoff), one per configuration"""
+    key = (legacy_tls, pool_connections, pool_maxsize)
+    with _session_lock:
+        if key not in _sessions:
+            ctx = None
+            if legacy_tls:
+                ctx = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
+                ctx.options |= 0x4  # OP_LEGACY_SERVER_CONNECT
+            # raise_on_status=False: hết lượt thử lại thì trả về phản hồi lỗi cuối cùng thay vì ném RetryError
+            retry = Retry(total=HTTP_RETRIES, backoff_factor=0.5,
+                          status_forcelist=(429, 500, 502, 503, 504),
+                          allowed_methods=frozenset(["GET", "HEAD"]), raise_on_status=False)
+            adapter = CustomHttpAdapter(ctx, pool_connections=pool_connections,
+                                        pool_maxsize=pool_maxsize, max_retries=retry)
+            session = requests.Session()
+            session.headers['User-Agent'] = USER_AGENT
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[key] = session
+        return _sessions[key]
+
+
 def get_legacy_session():
-    ctx = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
-    ctx.options |= 0x4  # OP_LEGACY_SERVER_CONNECT
-    session = requests.session()
-    session.mount('https://', CustomHttpAdapter(ctx))
-    return session
+    return get_session(legacy_tls=True)
+
+
+def fetch_page(url, headers=None, legacy_tls=False, timeout=HTTP_TIMEOUT):
+    """GET a page through the shared session, revalidating a cached copy with ETag/Last-Modified.
+
+    Returns the body bytes, or None when the server answers with an error status.
+    """
+    cache_file = cache_path("http", hashlib.sha256(url.encode("utf-8")).hexdigest() + ".pkl")
+    cached = None
+    try:
+        with open(cache_file, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError):
+        pass
+
+    headers = dict(headers or {})
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    response = get_session(legacy_tls).get(url, headers=headers, timeout=timeout)
+    # 304: trang không đổi, dùng lại bản đã lưu
+    if response.status_code == 304 and cached:
+        return cached["content"]
+    if response.status_code != 200:
+        return None
+
+    etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+    if etag or last_modified:
+        try:
+            with atomic_write(cache_file) as f:
+                pickle.dump({"etag": etag, "last_modified": last_modified, "content": response.content}, f)
+        except OSError as e:
+            print(f"Không lưu được cache trang {url}: {e}")
+    return response.content
 
 def get_mwg_intro(url):
     headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0.4472.124 Safari/537.36'}
     try:
-        response = get_legacy_session().get(url, headers=headers)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            intro = soup.find('div', class_='intro_content').find('p')
-            return intro.get_text(strip=True) if intro else "Không tìm thấy phần giới thiệu."
+        content = fetch_page(url, headers=headers, legacy_tls=True)
+        if content is not None:
+            return extract_intro(content) or "Không tìm thấy phần giới thiệu."
             
     except requests.exceptions.SSLError as e:
         return f"Lỗi SSL: {e}"
@@ -42,54 +117,44 @@ def get_mwg_intro(url):
         return f"Lỗi khác: {e}"
 
 
-def get_mwg_info(label=None):
-    vietstock_url = "https://finance.vietstock.vn/MWG-ctcp-dau-tu-the-gioi-di-dong.htm"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
+VIETSTOCK_PROFILE_URL = "https://finance.vietstock.vn/MWG-ctcp-dau-tu-the-gioi-di-dong.htm"
+# Trang hồ sơ doanh nghiệp của mã bất kỳ trên Vietstock
+VIETSTOCK_TICKER_URL = "https://finance.vietstock.vn/{ticker}/ho-so-doanh-nghiep.htm"
+
+def vietstock_profile_url(ticker):
+    return VIETSTOCK_PROFILE_URL if ticker.upper() == "MWG" else VIETSTOCK_TICKER_URL.format(ticker=ticker.upper())
+
+@profile_cache("vietstock")
+def get_vietstock_profile(ticker="MWG", url=None):
+    """Fetch the Vietstock profile page once and parse address, phone and website"""
     try:
-        response = requests.get(vietstock_url, headers=headers)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            profile_div = soup.find("div", id="profile-1").find("p")
-            
-            # Xử lý các thẻ HTML thừa như <b>, <a>, <span>
-            for tag in profile_div.find_all(['b', 'a', 'span']):
-                tag.unwrap()
-
-            # Lấy các đoạn thông tin sau khi đã loại bỏ thẻ không cần thiết
-            fields = str(profile_div).replace("</p>", "").split("<p>")[1:]
-
-            # Dictionary để lưu thông tin
-            info = {}
-            labels = ["Địa chỉ", "Điện thoại", "Website"]
-
-            # Duyệt qua các đoạn thông tin tìm kiếm theo từng label
-            for text in fields:
-                for key in labels:
-                    if key in text:
-                        value = text.split(":")[-1].strip()  # Lấy phần giá trị sau dấu ":"
-                        if key == "Website":
-                            info[key] = f"http:{value}"  # Thêm "http://" cho website
-                        else:
-                            info[key] = value
-
-            # Trả về thông tin theo label cụ thể hoặc toàn bộ thông tin
-            if label:
-                return info.get(label, f"Không tìm thấy thông tin cho {label}")
-            
-            return info  # Trả về toàn bộ thông tin nếu không chỉ định label
+        content = fetch_page(url or vietstock_profile_url(ticker))
+        if content is not None:
+            return extract_profile(content)
 
     except Exception as e:
         print(f"Error: {e}")
+    return None
+
+def get_mwg_info(label=None, ticker="MWG"):
+    info = get_vietstock_profile(ticker)
+    if info is None:
         return None
 
+    # Trả về thông tin theo label cụ thể hoặc toàn bộ thông tin
+    if label:
+        return info.get(label, f"Không tìm thấy thông tin cho {label}")
+    return info  # Trả về toàn bộ thông tin nếu không chỉ định label
+
 url = "https://mwg.vn"  # Thay bằng URL thực tế
 
+@profile_cache("vnstock")
+def fetch_company_overview(ticker):
+    """Company overview from Vnstock (one request per ticker within the TTL)"""
+    return Company(symbol=ticker).overview()
+
 def get_company_info(ticker, column=None):
-    data = Company(symbol=ticker)
-    info = data.overview()
+    info = fetch_company_overview(ticker)
     if info.empty:
         return f"Không tìm thấy dữ liệu cho {ticker}"
     if column:
@@ -98,22 +163,27 @@ def get_company_info(ticker, column=None):
         else:
             return f"Cột '{column}' không tồn tại trong dữ liệu."
     
-    return info  # Trả về toàn bộ DataFrame nếu không truyền column
+    return info.copy()  # Trả về toàn bộ DataFrame nếu không truyền column
 
 ticker = 'MWG'  # Mã cổ phiếu
 
 import pandas as pd
-from vnstock import Vnstock
+from vnstock import Quote
 
 # Hàm lấy dữ liệu chứng khoán từ Vnstock
 def get_stock_data(symbol, start_date="2024-01-01", end_date="2024-12-31"):
-  
-    stock = Vnstock().stock(symbol=symbol, source="VCI")
-    df = stock.quote.history(start=start_date, end=end_date, interval="1D")
+    """(daily bars, vnstock Quote for symbol), or (None, None) when there is no data.
+
+    The second value used to be Vnstock().stock(...); it is now a Quote, which
+    offers the same history() call without the company lookup a stock object
+    makes on creation. Callers that need the other stock APIs should build
+    Vnstock().stock(symbol) themselves.
+    """
+    # Lấy từ kho giá cục bộ, chỉ tải thêm những ngày còn thiếu
+    df = get_price_history(symbol, start_date, end_date)
     
     if df is not None and not df.empty:
-        df["time"] = pd.to_datetime(df["time"])  # Chuyển đổi sang kiểu datetime
-        return df, stock
+        return df, Quote(symbol=symbol, source="VCI")
     return None, None
 
 # Hàm tính toán phần trăm thay đổi giá cổ phiếu
@@ -153,10 +223,8 @@ def get_financial_sumary():
 
 def calculate_beta(stock_symbol='MWG', market_symbol='VNINDEX', start_date='2024-01-01', end_date='2024-12-31'):
     def get_stock_data(symbol):
-        stock = Vnstock().stock(symbol, source="VCI")
-        df = stock.quote.history(start=start_date, end=end_date, interval="1D")
+        df = get_price_history(symbol, start_date, end_date)
         if df is not None and not df.empty:
-            df["time"] = pd.to_datetime(df["time"])
             df.set_index("time", inplace=True)
             return df
         return None
@@ -186,34 +254,19 @@ def calculate_beta(stock_symbol='MWG', market_symbol='VNINDEX', start_date='2024
     return beta
 
 def get_close_price_on_date(symbol='MWG', date='2024-12-31'):
-    stock = Vnstock().stock(symbol=symbol, source='VCI')
-    data = stock.quote.history(start=date, end=date, interval='1D')
+    data = get_price_history(symbol, date, date)
     
     if not data.empty:
         return data.iloc[0]['close']
 
-def get_market_value(date_target="2024-12-31", row_label="MOBILE WORLD INVESTMENT - MARKET VALUE", date_row_index=0):
-    # Đường dẫn đến file Excel
-    file_path = "E:\\Goi1\\CK\\data\\Vietnam_Marketcap.xlsx"
-    
-    # Đọc file Excel
-    df = pd.read_excel(file_path, sheet_name="Sheet2", header=None)
-
-    # Tìm cột ngày mục tiêu
-    try:
-        date_col_index = next(i for i, d in enumerate(df.iloc[date_row_index].astype(str)) if date_target in d)
-    except StopIteration:
-        raise ValueError(f"Không tìm thấy cột ngày {date_target} trong file Excel.")
+def get_market_value(date_target="2024-12-31", row_label="MOBILE WORLD INVESTMENT - MARKET VALUE", date_row_index=None, file_path="E:\\Goi1\\CK\\data\\Vietnam_Marketcap.xlsx"):
+    if date_row_index is not None:
+        # Store đọc ngày từ tiêu đề cột nên tham số này không còn tác dụng; giữ lại để không đổi vị trí file_path
+        warnings.warn("date_row_index không còn tác dụng và sẽ bị bỏ", DeprecationWarning, stacklevel=2)
+    # Tra cứu trong store đã đánh chỉ mục (chỉ đọc lại Excel khi file thay đổi)
+    store = get_marketcap_store(file_path, sheet_name="Sheet2")
+    market_value = store.get_value(row_label, date_target)
 
-    # Tìm dòng chứa nhãn cần tìm
-    try:
-        row_index = df[df.iloc[:, 0].astype(str).str.strip().str.contains(row_label, case=False, na=False)].index[0]
-    except IndexError:
-        raise ValueError(f"Không tìm thấy dòng '{row_label}' trong file Excel. Kiểm tra lại tên!")
-
-    # Lấy giá trị tại ô tương ứng
-    market_value = df.iloc[row_index, date_col_index]
-    
     # Trả về giá trị đã chuyển sang ngàn VND
     return market_value / 1000
 
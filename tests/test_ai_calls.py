@@ -0,0 +1,75 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_pdf
+
+
+def hold_all_slots():
+    for _ in range(generate_pdf.AI_CONCURRENCY):
+        generate_pdf._ai_slots.acquire()
+
+
+def release_all_slots():
+    for _ in range(generate_pdf.AI_CONCURRENCY):
+        generate_pdf._ai_slots.release()
+
+
+def test_call_without_deadline_waits_for_a_slot():
+    hold_all_slots()
+    results = []
+    caller = threading.Thread(target=lambda: results.append(
+        generate_pdf.call_with_retry(lambda timeout=None: "ok")))
+    caller.start()
+    time.sleep(0.2)
+    assert results == []  # vẫn đang chờ lượt, không báo hết giờ ngay
+    release_all_slots()
+    caller.join(2)
+    assert results == ["ok"]
+
+
+def test_call_with_expired_wait_times_out():
+    hold_all_slots()
+    try:
+        started = time.monotonic()
+        try:
+            generate_pdf.call_with_retry(lambda timeout=None: "ok", deadline=started + 0.2)
+        except TimeoutError:
+            pass
+        else:
+            raise AssertionError("call_with_retry không hết giờ khi không có lượt")
+        assert time.monotonic() - started >= 0.15
+    finally:
+        release_all_slots()
+
+
+def test_batch_answer_with_extra_ids_and_code_fence():
+    answer = '```json\n{"chart_1": " Tăng trưởng tốt ", "chart_2": "Ổn định", "chart_9": "thừa"}\n```'
+    # Mã biểu đồ thừa bị bỏ qua, văn bản được cắt khoảng trắng
+    assert generate_pdf.parse_batch_analysis(answer, ["chart_1", "chart_2"]) == {
+        "chart_1": "Tăng trưởng tốt", "chart_2": "Ổn định"}
+
+
+def test_batch_answer_missing_or_empty_chart_is_rejected():
+    ids = ["chart_1", "chart_2"]
+    assert generate_pdf.parse_batch_analysis('{"chart_1": "Tốt"}', ids) is None
+    assert generate_pdf.parse_batch_analysis('{"chart_1": "Tốt", "chart_2": "  "}', ids) is None
+    assert generate_pdf.parse_batch_analysis('{"chart_1": "Tốt", "chart_2": 5}', ids) is None
+    assert generate_pdf.parse_batch_analysis("không phải JSON", ids) is None
+    assert generate_pdf.parse_batch_analysis(None, ids) is None
+
+
+def test_incomplete_batch_answer_falls_back_to_one_call_per_chart(monkeypatch):
+    monkeypatch.setattr(generate_pdf, "read_chart", lambda path: (path.encode(), path))
+    monkeypatch.setattr(generate_pdf, "encode_for_upload", lambda image_bytes: (image_bytes, "image/png"))
+    monkeypatch.setattr(generate_pdf, "load_analysis", lambda key: None)
+    monkeypatch.setattr(generate_pdf, "save_analysis", lambda *args, **kwargs: None)
+    monkeypatch.setattr(generate_pdf, "request_batch_analysis", lambda charts, timeout=None: '{"chart_1": "Tốt"}')
+    monkeypatch.setattr(generate_pdf, "analyze_chart", lambda path, refresh=None, deadline=None: f"riêng {path}")
+
+    results = generate_pdf.analyze_charts(["a.png", "b.png"], refresh=False)
+    # Thiếu chart_2 nên không dùng kết quả gộp nào, cả hai biểu đồ được phân tích riêng
+    assert results == {"a.png": "riêng a.png", "b.png": "riêng b.png"}
@@ -0,0 +1,49 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analysis_cache
+from cache_utils import atomic_write
+
+
+def test_concurrent_writers_of_one_entry_all_succeed(tmp_path):
+    path = str(tmp_path / "entry.json")
+    errors = []
+
+    def write(i):
+        try:
+            for _ in range(50):
+                with atomic_write(path, "w", encoding="utf-8") as f:
+                    f.write(f"writer {i}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert open(path, encoding="utf-8").read().startswith("writer ")
+    assert os.listdir(tmp_path) == ["entry.json"]
+
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    path = tmp_path / "entry.bin"
+    path.write_bytes(b"old")
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path)) as f:
+            f.write(b"partial")
+            raise RuntimeError("lỗi giữa chừng")
+    assert path.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["entry.bin"]
+
+
+def test_analysis_cache_write_failure_is_not_fatal(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(analysis_cache, "analysis_file", lambda key: str(tmp_path / "missing" / f"{key}.json"))
+    analysis_cache.save_analysis("abc123", "phân tích")
+    assert "Không lưu được cache phân tích" in capsys.readouterr().out
@@ -0,0 +1,49 @@
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chart_service
+from chart_service import ChartService
+from marketcap import plot_marketcap
+
+active = []
+peak = []
+
+
+def slow_renderer(i, save_path=None):
+    active.append(i)
+    peak.append(len(active))
+    time.sleep(0.05)
+    active.remove(i)
+    return b"png"
+
+
+def test_in_process_renders_do_not_overlap():
+    service = ChartService(workers=1)
+    threads = [threading.Thread(target=lambda i=i: service.submit(slow_renderer, i).result()) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(peak) == 1
+
+
+class RecordingService:
+    def __init__(self):
+        self.calls = []
+
+    def render(self, func, *args, save_path=None, **kwargs):
+        self.calls.append(func)
+        return ChartService(workers=1).submit(lambda: save_path)
+
+
+def test_sector_chart_goes_through_the_chart_service():
+    df = pd.DataFrame({"Name": ["A", "B"], "Code": ["VT:MWG(MV)", "VT:FRT(MV)"], "2024-12-31": [2e6, 1e6]})
+    service = RecordingService()
+    assert plot_marketcap(df, save_path="market.png", chart_service=service) == "market.png"
+    assert service.calls == [chart_service.marketcap_chart]
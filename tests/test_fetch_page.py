@@ -0,0 +1,34 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import test_info
+
+
+class AlwaysUnavailable(BaseHTTPRequestHandler):
+    requests_seen = 0
+
+    def do_GET(self):
+        AlwaysUnavailable.requests_seen += 1
+        self.send_response(503)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_fetch_page_returns_none_after_retries_on_5xx(tmp_path, monkeypatch):
+    monkeypatch.setattr(test_info, "HTTP_RETRIES", 1)
+    monkeypatch.setattr(test_info, "_sessions", {})
+    monkeypatch.setattr(test_info, "cache_path", lambda *parts: str(tmp_path / parts[-1]))
+    server = HTTPServer(("127.0.0.1", 0), AlwaysUnavailable)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        assert test_info.fetch_page(f"http://127.0.0.1:{server.server_port}/", timeout=5) is None
+        assert AlwaysUnavailable.requests_seen == 2  # lần đầu + 1 lần thử lại
+    finally:
+        server.shutdown()
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from financial_ratio import calculate_ratio_panel, labels, ticker_ratios
+from generate_pdf import prepare_financial_data
+
+
+def yearly_frames():
+    # Mã NEW chỉ niêm yết từ 2023, OLD có đủ 5 năm
+    return [pd.DataFrame({"Mã": ["OLD", "NEW"] if year >= 2023 else ["OLD"]}) for year in range(2020, 2025)]
+
+
+def test_tables_follow_available_years():
+    panel = calculate_ratio_panel(yearly_frames(), labels)
+    for symbol, years in (("NEW", ["2023", "2024"]), ("OLD", ["2020", "2021", "2022", "2023", "2024"])):
+        for table in prepare_financial_data(ticker_ratios(panel, symbol)):
+            assert all(row.index.tolist() == years for row in table.values())
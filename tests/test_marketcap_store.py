@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import marketcap_store
+from marketcap_store import MarketCapStore
+
+
+def sample_store():
+    names = ["MOBILE WORLD - MARKET VALUE", "FPT RETAIL - MARKET VALUE", "VINAMILK - MARKET VALUE"]
+    info = pd.DataFrame({"Name": names, "Code": ["VT:MWG(MV)", "VT:FRT(MV)", "VT:VNM(MV)"]}, index=names)
+    values = pd.DataFrame(np.arange(9, dtype=float).reshape(3, 3), index=names,
+                          columns=pd.DatetimeIndex(["2024-12-30", "2024-12-31", "2025-01-02"]))
+    return MarketCapStore(info, values)
+
+
+def test_sector_frame_matches_filtering_the_full_frame(tmp_path):
+    sample_store().publish("caps", folder=str(tmp_path))
+    store = MarketCapStore.attach("caps", folder=str(tmp_path))
+
+    full = store.to_frame()
+    full = full[full["Code"].str.extract(r"VT:([A-Z]+)\(")[0].isin(["FRT", "MWG"])]
+    sector = store.to_frame(store.ticker_rows(["FRT", "MWG"]))
+    pd.testing.assert_frame_equal(sector.reset_index(drop=True), full.reset_index(drop=True))
+    assert not store.values.to_numpy().flags.writeable  # ma trận vẫn là memmap chỉ đọc, không bị chép
+
+
+def test_worker_attaches_published_store_without_hashing(tmp_path, monkeypatch):
+    workbook = tmp_path / "caps.xlsx"
+    workbook.write_bytes(b"placeholder")
+    sample_store().publish("caps.v1", folder=str(tmp_path))
+    monkeypatch.setenv("REPORT_SHARED_DATA", str(tmp_path))
+    monkeypatch.setattr(marketcap_store, "_stores", {})
+    monkeypatch.setattr(marketcap_store, "_published", {})
+
+    def no_hashing(path):
+        raise AssertionError("tiến trình con không được hash lại workbook")
+    monkeypatch.setattr(marketcap_store, "file_fingerprint", no_hashing)
+
+    marketcap_store.use_published_stores({(os.path.abspath(str(workbook)), "Sheet2"): "caps.v1"})
+    store = marketcap_store.get_marketcap_store(str(workbook), "Sheet2")
+    assert store.get_value("FRT", "2024-12-31") == 4.0
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+from reportlab import rl_config
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_output import binary_streams, report_canvas
+
+
+def test_binary_streams_restores_setting(tmp_path):
+    previous = rl_config.useA85
+    with binary_streams():
+        assert rl_config.useA85 == 0
+        c = report_canvas(str(tmp_path / "a.pdf"))
+        c.drawString(72, 72, "MWG")
+        c.save()
+    # Cờ toàn cục trở lại như cũ sau khi vẽ xong
+    assert rl_config.useA85 == previous
+    assert b"ASCII85Decode" not in (tmp_path / "a.pdf").read_bytes()
+
+
+def test_binary_streams_restores_on_error():
+    previous = rl_config.useA85
+    with pytest.raises(RuntimeError):
+        with binary_streams():
+            raise RuntimeError("vẽ lỗi")
+    assert rl_config.useA85 == previous
+
+
+def test_report_canvas_leaves_global_alone(tmp_path):
+    previous = rl_config.useA85
+    report_canvas(str(tmp_path / "b.pdf")).save()
+    assert rl_config.useA85 == previous
@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import price_store
+
+
+def use_store(tmp_path, monkeypatch, responses):
+    """Point the store at a temporary database and answer fetches from responses (a list of frames)"""
+    calls = []
+    monkeypatch.setattr(price_store, "get_db_path", lambda: str(tmp_path / "prices.sqlite"))
+
+    def fake_fetch(symbol, start_date, end_date, interval="1D"):
+        calls.append((start_date, end_date))
+        return responses.pop(0)
+    monkeypatch.setattr(price_store, "fetch_history", fake_fetch)
+    return calls
+
+
+def bars(*days):
+    return pd.DataFrame({"time": pd.to_datetime(list(days)), "open": 1.0, "high": 1.0, "low": 1.0,
+                         "close": 1.0, "volume": 1.0})
+
+
+def test_empty_fetch_is_not_marked_covered(tmp_path, monkeypatch):
+    calls = use_store(tmp_path, monkeypatch, [bars(), bars("2024-01-02", "2024-01-03")])
+    assert price_store.get_price_history("AAA", "2024-01-01", "2024-01-03").empty
+    assert len(price_store.get_price_history("AAA", "2024-01-01", "2024-01-03")) == 2
+    assert calls == [("2024-01-01", "2024-01-03")] * 2
+
+
+def test_coverage_stops_at_last_bar_received(tmp_path, monkeypatch):
+    calls = use_store(tmp_path, monkeypatch, [bars("2024-01-02"), bars("2024-01-03")])
+    price_store.get_price_history("AAA", "2024-01-01", "2024-01-05")
+    assert len(price_store.get_price_history("AAA", "2024-01-01", "2024-01-05")) == 2
+    assert calls == [("2024-01-01", "2024-01-05"), ("2024-01-03", "2024-01-05")]
+
+
+def test_today_stays_uncovered(tmp_path, monkeypatch):
+    today = pd.Timestamp.today().normalize()
+    yesterday = today - pd.Timedelta(days=1)
+    calls = use_store(tmp_path, monkeypatch, [bars(yesterday, today), bars(today)])
+    price_store.get_price_history("AAA", yesterday, today)
+    price_store.get_price_history("AAA", yesterday, today)
+    assert calls[1] == (f"{today:%Y-%m-%d}", f"{today:%Y-%m-%d}")
+
+
+def test_prefix_fetch_ending_early_leaves_the_gap_uncovered(tmp_path, monkeypatch):
+    calls = use_store(tmp_path, monkeypatch, [bars("2024-01-10", "2024-01-11", "2024-01-12"), bars("2024-01-03"),
+                                              bars("2024-01-08")])
+    price_store.get_price_history("AAA", "2024-01-10", "2024-01-12")
+    price_store.get_price_history("AAA", "2024-01-01", "2024-01-12")
+    assert len(price_store.get_price_history("AAA", "2024-01-01", "2024-01-12")) == 5
+    # Khoảng 04-09/01 chưa nhận được nến nào nên vẫn phải tải lại
+    assert calls == [("2024-01-10", "2024-01-12"), ("2024-01-01", "2024-01-09"), ("2024-01-04", "2024-01-09")]
+
+
+def test_coalescer_merges_overlapping_requests_into_one_fetch():
+    calls = []
+
+    def fetch(symbol, start, end, interval):
+        calls.append((symbol, start, end))
+        time.sleep(0.05)
+
+    coalescer = price_store.RangeCoalescer(fetch, window=0.2)
+    ranges = [(1, 5), (3, 8), (2, 4), (6, 10)]
+    threads = [threading.Thread(target=coalescer.request, args=("AAA", start, end)) for start, end in ranges]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Bốn yêu cầu chồng lấn đến trong cửa sổ gom chỉ gây một lần tải cho khoảng hợp
+    assert calls == [("AAA", 1, 10)]
+
+
+def test_coalescer_shares_fetch_errors_with_waiters():
+    def fetch(symbol, start, end, interval):
+        time.sleep(0.05)
+        raise RuntimeError("mất mạng")
+
+    coalescer = price_store.RangeCoalescer(fetch, window=0.2)
+    errors = []
+
+    def request(start, end):
+        try:
+            coalescer.request("AAA", start, end)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=request, args=(start, start + 2)) for start in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import profile_cache
+
+
+def test_explicit_url_is_part_of_the_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(profile_cache, "cache_path", lambda *parts: str(tmp_path / "_".join(parts)))
+    profile_cache.clear_profile_cache()
+    calls = []
+
+    @profile_cache.profile_cache("test")
+    def lookup(ticker, url=None):
+        calls.append(url)
+        return f"{ticker}@{url}"
+
+    assert lookup("MWG") == "MWG@None"
+    assert lookup("mwg", url=None) == "MWG@None"  # giá trị mặc định dùng chung khóa
+    assert lookup("MWG", url="https://example.com/a") == "MWG@https://example.com/a"
+    assert lookup("MWG", "https://example.com/b") == "MWG@https://example.com/b"
+    assert lookup("MWG", url="https://example.com/a") == "MWG@https://example.com/a"
+    assert calls == [None, "https://example.com/a", "https://example.com/b"]
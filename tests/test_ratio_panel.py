@@ -0,0 +1,34 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from financial_ratio import (calculate_financial_ratios, calculate_ratio_panel, labels, merge_df,
+                             ticker_ratios, transpose_data)
+from statement_loader import needed_columns
+
+
+def yearly_frames():
+    rng = np.random.default_rng(7)
+    columns = sorted(needed_columns(labels, extra=()))
+    frames = []
+    for year in range(2020, 2025):
+        df = pd.DataFrame(rng.uniform(-50, 500, size=(3, len(columns))), columns=columns)
+        df.insert(0, "Mã", ["AAA", "BBB", "CCC"])
+        # Mẫu số bằng 0 và ô trống phải cho cùng kết quả ở cả hai cách tính
+        df.loc[1, "CĐKT. VỐN CHỦ SỞ HỮU"] = 0
+        df.loc[2, "KQKD. CHI PHÍ LÃI VAY"] = np.nan
+        frames.append(df)
+    return frames
+
+
+def test_panel_matches_per_ticker_ratios():
+    dfs = yearly_frames()
+    panel = calculate_ratio_panel(dfs, labels)
+    for symbol in ("AAA", "BBB", "CCC"):
+        # Cách tính cũ: lọc từng mã, chuyển vị rồi tính tỷ lệ
+        expected = calculate_financial_ratios(transpose_data(merge_df(dfs, symbol)), labels)
+        pd.testing.assert_frame_equal(ticker_ratios(panel, symbol), expected)
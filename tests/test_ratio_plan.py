@@ -0,0 +1,44 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ratio_plan import compile_ratio_plan, evaluate_ratio_plan
+
+LABELS = {"income": ["A", "B"], "equity": ["E"], "revenue": ["R"]}
+
+
+def test_plan_evaluates_expressions_and_safe_division():
+    plan = compile_ratio_plan({"ROE": "income / equity * 100", "Loss": "-income", "Revenue": "revenue"}, LABELS)
+    values = {"A": np.array([1.0, 2.0]), "B": np.array([3.0, 4.0]), "E": np.array([8.0, 0.0])}
+    result = evaluate_ratio_plan(plan, lambda label: values.get(label, np.zeros(2)), 2)
+    np.testing.assert_array_equal(result["ROE"], [50.0, 0.0])  # mẫu số 0 thì trả 0
+    np.testing.assert_array_equal(result["Loss"], [-4.0, -6.0])
+    np.testing.assert_array_equal(result["Revenue"], [0.0, 0.0])
+
+
+def test_shared_names_are_computed_once():
+    plan = compile_ratio_plan({"ROE": "profit / equity", "Twice": "profit + profit"}, LABELS,
+                              {"profit": "income - revenue"})
+    calls = []
+
+    def get_values(label):
+        calls.append(label)
+        return np.ones(3)
+
+    result = evaluate_ratio_plan(plan, get_values, 3)
+    # Mỗi dòng chi tiết chỉ được đọc một lần dù nhiều tỷ lệ dùng chung
+    assert sorted(calls) == ["A", "B", "E", "R"]
+    np.testing.assert_array_equal(result["Twice"], [2.0, 2.0, 2.0])
+
+
+def test_unknown_names_and_cycles_are_rejected():
+    with pytest.raises(ValueError):
+        compile_ratio_plan({"X": "missing * 2"}, LABELS)
+    with pytest.raises(ValueError):
+        compile_ratio_plan({"X": "a"}, LABELS, {"a": "b + 1", "b": "a"})
+    with pytest.raises(ValueError):
+        compile_ratio_plan({"X": "income ** 2"}, LABELS)
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache_utils
+import render_cache
+
+calls = []
+
+
+def fake_chart(df, title="A", save_path=None):
+    calls.append(title)
+    return f"{title}:{df['v'].sum()}".encode("utf-8")
+
+
+def use_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(render_cache, "RENDER_CACHE_DIR", str(tmp_path / "charts"))
+    calls.clear()
+
+
+def test_key_follows_data_and_parameters_but_not_save_path():
+    df = pd.DataFrame({"v": [1, 2]})
+    key = render_cache.render_key(fake_chart, (df,), {})
+    assert render_cache.render_key(fake_chart, (df.copy(),), {"save_path": "x.png"}) == key
+    assert render_cache.render_key(fake_chart, (df,), {"title": "A"}) == key  # giá trị mặc định
+    assert render_cache.render_key(fake_chart, (df,), {"title": "B"}) != key
+    assert render_cache.render_key(fake_chart, (pd.DataFrame({"v": [1, 3]}),), {}) != key
+
+
+def test_cached_render_draws_each_chart_once(tmp_path, monkeypatch):
+    use_cache(tmp_path, monkeypatch)
+    df = pd.DataFrame({"v": [1, 2]})
+    first = render_cache.cached_render(fake_chart, df)
+    render_cache.cached_render(fake_chart, df, save_path=str(tmp_path / "out.png"))
+    assert calls == ["A"]
+    assert (tmp_path / "out.png").read_bytes() == first == b"A:3"
+
+
+def test_evict_removes_least_recently_used_first(tmp_path, monkeypatch):
+    use_cache(tmp_path, monkeypatch)
+    keys = [f"{i:02d}" + "0" * 62 for i in range(3)]
+    for i, key in enumerate(keys):
+        with open(render_cache.chart_file(key), "wb") as f:
+            f.write(b"x" * 100)
+        os.utime(render_cache.chart_file(key), (1000 + i, 1000 + i))
+    # Đọc ảnh cũ nhất làm mới thời điểm dùng của nó
+    assert render_cache.load_chart(keys[0]) == b"x" * 100
+
+    render_cache.evict(max_bytes=200)
+    assert [os.path.exists(render_cache.chart_file(key)) for key in keys] == [True, False, True]
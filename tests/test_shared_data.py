@@ -0,0 +1,45 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache_utils
+from shared_data import SHARED_DATA_ENV, attach_frame, publish_frame, shared_folder
+
+
+def ratio_panel():
+    index = pd.MultiIndex.from_product([["FRT", "MWG"], ["2023", "2024"]], names=["Mã", "Năm"])
+    return pd.DataFrame({"ROE": [1.5, 2.5, np.nan, 4.0], "ROA": [0.1, 0.2, 0.3, 0.4]}, index=index)
+
+
+def test_frame_survives_publish_attach_round_trip(tmp_path):
+    panel = ratio_panel()
+    publish_frame("ratio_panel", panel, meta={"years": 2}, folder=str(tmp_path))
+    frame, meta = attach_frame("ratio_panel", folder=str(tmp_path))
+
+    pd.testing.assert_frame_equal(frame, panel)
+    assert meta == {"years": 2}
+    # Tiến trình con chỉ đọc trên memmap dùng chung, không được sửa dữ liệu của tiến trình khác
+    with pytest.raises(ValueError):
+        frame.to_numpy()[0, 0] = 0
+
+
+def test_attach_without_published_frame_returns_none(tmp_path, monkeypatch):
+    monkeypatch.delenv(SHARED_DATA_ENV, raising=False)
+    assert attach_frame("ratio_panel") is None
+    assert attach_frame("ratio_panel", folder=str(tmp_path)) is None
+
+
+def test_shared_folder_is_visible_to_children_then_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    monkeypatch.delenv(SHARED_DATA_ENV, raising=False)
+    with shared_folder() as folder:
+        publish_frame("ratio_panel", ratio_panel())
+        assert os.environ[SHARED_DATA_ENV] == folder
+        assert attach_frame("ratio_panel") is not None
+    assert SHARED_DATA_ENV not in os.environ
+    assert not os.path.exists(folder)
@@ -0,0 +1,40 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_graph import TaskGraph
+
+
+def test_dependency_finishing_after_exit_cancels_dependents():
+    release = threading.Event()
+    with TaskGraph(max_workers=2) as graph:
+        graph.add("slow", lambda: release.wait(5) and "done")
+        graph.add("after", lambda value: value + "!", deps=["slow"])
+        # Tác vụ gốc chỉ xong khi graph đã bắt đầu shutdown
+        threading.Timer(0.2, release.set).start()
+    assert graph.result("slow") == "done"
+    with pytest.raises(CancelledError):
+        graph.result("after", timeout=1)
+
+
+def test_queued_tasks_are_cancelled_on_shutdown():
+    started = threading.Event()
+    with TaskGraph(max_workers=1) as graph:
+        graph.add("busy", lambda: started.set() or time.sleep(0.3))
+        graph.add("queued", lambda: "never")
+        started.wait(1)
+    with pytest.raises(CancelledError):
+        graph.result("queued", timeout=1)
+
+
+def test_results_flow_to_dependents():
+    with TaskGraph(max_workers=2) as graph:
+        graph.add("a", lambda: 2)
+        graph.add("b", lambda a: a * 3, deps=["a"])
+        assert graph.result("b", timeout=1) == 6
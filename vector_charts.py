@@ -0,0 +1,55 @@
+import pandas as pd
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+
+# Khung thời gian của biểu đồ giá: (từ ngày, đến ngày, tần suất vạch chia, định dạng nhãn, tiêu đề)
+PRICE_WINDOWS = {
+    "6m": ("2024-07-01", "2024-12-31", "MS", "%m/%Y", "6 tháng"),
+    "5y": ("2020-01-01", "2024-12-31", "YS", "%Y", "5 năm"),
+}
+
+
+def day_number(dates):
+    """Dates as float day numbers, the x values of the line plot"""
+    return (pd.to_datetime(dates) - pd.Timestamp("1970-01-01")) / pd.Timedelta(days=1)
+
+
+def price_chart_drawing(df, symbol, period, width, height, font="Helvetica"):
+    """Closing-price chart as a ReportLab Drawing (vector, no raster step)"""
+    start, end, tick_freq, tick_format, title = PRICE_WINDOWS[period]
+    data = df[(df["time"] >= start) & (df["time"] <= end)]
+    x_values = day_number(data["time"])
+    points = list(zip(x_values, data["close"].astype(float)))
+
+    ticks = pd.date_range(start=start, end=end, freq=tick_freq)
+    tick_labels = dict(zip(day_number(ticks), ticks.strftime(tick_format)))
+
+    drawing = Drawing(width, height)
+    drawing.add(String(4, height - 12, f"{symbol} - {title}", fontName=font, fontSize=9))
+
+    plot = LinePlot()
+    plot.x, plot.y = 38, 18
+    plot.width, plot.height = width - plot.x - 8, height - plot.y - 22
+    plot.data = [points]
+    plot.lines[0].strokeColor = colors.blue
+    plot.lines[0].strokeWidth = 0.8
+
+    plot.xValueAxis.valueMin = day_number([start])[0]
+    plot.xValueAxis.valueMax = day_number([end])[0]
+    plot.xValueAxis.valueSteps = list(tick_labels)
+    plot.xValueAxis.labelTextFormat = lambda value: tick_labels.get(value, "")
+    plot.yValueAxis.labelTextFormat = "%.3f"
+    for axis in (plot.xValueAxis, plot.yValueAxis):
+        axis.labels.fontName = font
+        axis.labels.fontSize = 6
+        axis.visibleGrid = 1
+        axis.gridStrokeColor = colors.lightgrey
+        axis.gridStrokeWidth = 0.3
+    if points:
+        low, high = data["close"].min(), data["close"].max()
+        margin = (high - low) * 0.05 or 1
+        plot.yValueAxis.valueMin = low - margin
+        plot.yValueAxis.valueMax = high + margin
+    drawing.add(plot)
+    return drawing